@@ -0,0 +1,94 @@
+"""Per-item vs. bulk quest creation and completion against a running server.
+
+Needs httpx. Run from backend/ with the API up:
+    python -m benchmarks.bench_bulk_quests --base-url http://localhost:8000/api --quests 200
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+QUEST = {
+    'title': 'Benchmark quest',
+    'description': 'Created by bench_bulk_quests',
+    'quest_type': 'daily',
+    'difficulty': 'easy',
+    'xp_reward': 10,
+    'gold_reward': 5,
+    'category': 'productivity',
+}
+
+
+async def _register(client: httpx.AsyncClient) -> dict:
+    name = f"bench_{uuid.uuid4().hex[:10]}"
+    r = await client.post('/auth/register', json={'email': f'{name}@example.com', 'password': 'BenchPass123!', 'username': name})
+    r.raise_for_status()
+    return {'Authorization': f"Bearer {r.json()['token']}"}
+
+
+async def _timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def per_item(client, n: int) -> dict:
+    headers = await _register(client)
+
+    async def create_all():
+        ids = []
+        for _ in range(n):
+            r = await client.post('/quests/create', json=QUEST, headers=headers)
+            r.raise_for_status()
+            ids.append(r.json()['id'])
+        return ids
+
+    async def complete_all(ids):
+        for quest_id in ids:
+            (await client.post(f'/quests/{quest_id}/complete', headers=headers)).raise_for_status()
+
+    ids, create_s = await _timed(create_all())
+    _, complete_s = await _timed(complete_all(ids))
+    return {'mode': 'per-item', 'quests': n, 'create_s': round(create_s, 3), 'complete_s': round(complete_s, 3)}
+
+
+async def bulk(client, n: int) -> dict:
+    headers = await _register(client)
+
+    async def create_all():
+        r = await client.post('/quests/bulk', json=[QUEST] * n, headers=headers)
+        r.raise_for_status()
+        return [item['id'] for item in r.json()['results'] if item['status'] == 'created']
+
+    async def complete_all(ids):
+        (await client.post('/quests/complete/bulk', json={'quest_ids': ids}, headers=headers)).raise_for_status()
+
+    ids, create_s = await _timed(create_all())
+    _, complete_s = await _timed(complete_all(ids))
+    return {'mode': 'bulk', 'quests': n, 'create_s': round(create_s, 3), 'complete_s': round(complete_s, 3)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://localhost:8000/api')
+    parser.add_argument('--quests', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        results = [await per_item(client, args.quests), await bulk(client, args.quests)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        total = r['create_s'] + r['complete_s']
+        print(f"{r['mode']:<9} create {r['create_s']:>7}s  complete {r['complete_s']:>7}s  "
+              f"({r['quests'] / total:.1f} quests/s end to end)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""Cache backend throughput and cross-worker invalidation latency.
+
+Runs get/set against each backend, then for the shared ones measures how
+long a published message takes to reach a second instance, which stands in
+for another worker. The Redis-protocol backend runs against the in-process
+fake from benchmarks.fake_redis unless --redis-url points at a real server.
+
+Run from backend/:  python -m benchmarks.bench_cache_backends --ops 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import orjson
+
+from benchmarks.fake_redis import FakeRedis
+from benchmarks.stats import percentile
+from cache_backend import MemoryBackend, MmapBackend, RespBackend
+
+USER = orjson.dumps({
+    'id': '6f1c2b9e-1c8e-4d5a-9a0e-3f2d1c0b9a87', 'email': 'bench@example.com', 'username': 'bench',
+    'avatar': {'avatar_class': 'mage', 'avatar_image': 'https://example.com/mage.png', 'name': 'Merlin'},
+    'level': 12, 'xp': 25000, 'gold': 900, 'hp': 100, 'max_hp': 100, 'streak': 4,
+    'badges': ['first_quest', 'quest_10'], 'inventory': {'health_potion': 2},
+})
+
+
+def _backends(kind: str, redis_url: str, mmap_path: str):
+    # Two instances of the same backend, standing in for two workers
+    if kind == 'memory':
+        return MemoryBackend(10000), None
+    if kind == 'mmap':
+        make = lambda: MmapBackend(mmap_path, slots=16384, slot_size=4096, ring_size=1024, poll_interval=0.001)
+        return make(), make()
+    make = lambda: RespBackend(redis_url, pool_size=8, timeout=1.0, channel='bench:invalidate')
+    return make(), make()
+
+
+async def _ops(backend, ops: int, concurrency: int) -> dict:
+    keys = [f'user:{i}' for i in range(1000)]
+
+    async def run(op):
+        start = time.perf_counter()
+        per_task = ops // concurrency
+        await asyncio.gather(*(
+            asyncio.gather(*(op(keys[(t * per_task + i) % len(keys)]) for i in range(per_task)))
+            for t in range(concurrency)
+        ))
+        return round(per_task * concurrency / (time.perf_counter() - start))
+
+    sets = await run(lambda key: backend.set(key, USER, ttl=60))
+    gets = await run(backend.get)
+    return {'set_ops_per_sec': sets, 'get_ops_per_sec': gets}
+
+
+async def _invalidation(writer, reader, messages: int) -> dict:
+    received = asyncio.Queue()
+    reader.start(lambda message: received.put_nowait((time.perf_counter(), message)))
+    writer.start(lambda message: None)
+    await asyncio.sleep(0.2)
+
+    # What another worker sees right after a write
+    await writer.set('user:shared', USER, ttl=60)
+    visible = await reader.get('user:shared') == USER
+
+    latencies = []
+    for i in range(messages):
+        sent = time.perf_counter()
+        await writer.publish(b'u %d' % i)
+        arrived, message = await asyncio.wait_for(received.get(), 5)
+        assert message == b'u %d' % i, message
+        latencies.append(arrived - sent)
+
+    await writer.stop()
+    await reader.stop()
+    return {
+        'visible_to_other_worker': visible,
+        'invalidation_p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'invalidation_p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def main_async(args) -> list:
+    fake = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        fake = FakeRedis()
+        redis_url = f'redis://127.0.0.1:{await fake.start()}/0'
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.backends:
+            first, second = _backends(kind, redis_url, os.path.join(tmp, 'cache'))
+            result = {'backend': kind, **await _ops(first, args.ops, args.concurrency)}
+            if second is not None:
+                result.update(await _invalidation(first, second, args.messages))
+            else:
+                await first.stop()
+            results.append(result)
+
+    if fake is not None:
+        await fake.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=['memory', 'mmap', 'redis'])
+    parser.add_argument('--redis-url', help='use a real Redis instead of the in-process fake')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        line = f"{r['backend']:<8} set {r['set_ops_per_sec']:>9}/s  get {r['get_ops_per_sec']:>9}/s"
+        if 'invalidation_p50_ms' in r:
+            line += (f"  shared={r['visible_to_other_worker']}  invalidation p50 {r['invalidation_p50_ms']}ms"
+                     f" p99 {r['invalidation_p99_ms']}ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
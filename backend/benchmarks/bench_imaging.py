@@ -0,0 +1,73 @@
+"""Throughput of the photo normalization pipeline versus process-pool size.
+
+Run from backend/:  python -m benchmarks.bench_imaging --images 32 --sizes 1,2,4
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+
+from PIL import Image
+
+from imaging import ImagePipeline, ImagePoolBusy
+
+
+def make_photo(width: int = 4032, height: int = 3024) -> bytes:
+    # A gradient compresses like a real photo far better than a flat colour.
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    out = io.BytesIO()
+    img.save(out, 'JPEG', quality=92)
+    return out.getvalue()
+
+
+async def run(pipeline: ImagePipeline, photo: bytes, images: int) -> dict:
+    async def one():
+        while True:
+            try:
+                return await pipeline.process(photo)
+            except ImagePoolBusy:
+                await asyncio.sleep(0.005)
+
+    # Warm the workers so process start-up is not counted.
+    await asyncio.gather(*(pipeline.process(photo) for _ in range(pipeline.workers)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(images)))
+    elapsed = time.perf_counter() - start
+    return {
+        'workers': pipeline.workers,
+        'images': images,
+        'seconds': round(elapsed, 3),
+        'images_per_second': round(images / elapsed, 2),
+        'rejected': pipeline.rejected,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=32)
+    parser.add_argument('--sizes', default=','.join(str(n) for n in (1, 2, 4, os.cpu_count() or 1)))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    photo = make_photo()
+    results = []
+    for workers in sorted({int(n) for n in args.sizes.split(',')}):
+        pipeline = ImagePipeline(workers=workers, max_pending=workers * 2)
+        try:
+            results.append(await run(pipeline, photo, args.images))
+        finally:
+            pipeline.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"input: {len(photo)} bytes, {args.images} images per run")
+    for r in results:
+        print(f"workers={r['workers']:<3} {r['images_per_second']:>8} img/s  ({r['seconds']}s, {r['rejected']} busy retries)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Concurrent login throughput: bcrypt inline on the event loop vs. PasswordPool.
+
+Each simulated login verifies one bcrypt hash. Alongside the logins a ticker
+coroutine measures how late the event loop wakes it up, which is the stall
+every other request on the worker would see.
+
+Run from backend/:  python -m benchmarks.bench_passwords --logins 64 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from passwords import PasswordPool, PasswordPoolBusy, hash_password, verify_password
+
+
+async def _ticker(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _measure(label: str, logins: int, login) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    return {
+        'mode': label,
+        'logins': logins,
+        'seconds': round(elapsed, 3),
+        'logins_per_second': round(logins / elapsed, 2),
+        'max_loop_lag_ms': round(max(lags, default=0) * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    hashed = hash_password('correct horse battery staple', args.rounds)
+
+    async def inline_login():
+        await asyncio.sleep(0)
+        assert verify_password('correct horse battery staple', hashed)
+
+    pool = PasswordPool(workers=args.workers, max_pending=args.logins, rounds=args.rounds)
+
+    async def pooled_login():
+        while True:
+            try:
+                assert await pool.verify('correct horse battery staple', hashed)
+                return
+            except PasswordPoolBusy:
+                await asyncio.sleep(0.005)
+
+    try:
+        results = [
+            await _measure('inline', args.logins, inline_login),
+            await _measure(f'pool({args.workers})', args.logins, pooled_login),
+        ]
+    finally:
+        pool.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"bcrypt rounds={args.rounds}, {args.logins} concurrent logins")
+    for r in results:
+        print(f"{r['mode']:<10} {r['logins_per_second']:>8} logins/s  max loop lag {r['max_loop_lag_ms']} ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
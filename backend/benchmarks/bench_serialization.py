@@ -0,0 +1,80 @@
+"""Per-endpoint response serialization cost: FastAPI's default path vs. the orjson fast path.
+
+"default" is what a handler returning a dict/model used to cost:
+jsonable_encoder followed by JSONResponse (stdlib json). "fast" is
+json_response(): orjson straight over the already JSON-safe data.
+
+Run from backend/:  python -m benchmarks.bench_serialization
+"""
+import argparse
+import json
+import timeit
+import uuid
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from server import SHOP_ITEMS, Quest, User, _build_stats
+
+
+def _quest(user_id: str, i: int) -> dict:
+    return Quest(
+        user_id=user_id, title=f'Quest {i}', description='Read 20 pages of a book before bed',
+        quest_type='daily', difficulty='medium', xp_reward=100, gold_reward=25, category='learning',
+    ).model_dump()
+
+
+def payloads() -> dict:
+    user = User(email='bench@example.com', username='bench').model_dump()
+    quests = [_quest(user['id'], i) for i in range(100)]
+    stats = _build_stats(user, {'active': 12, 'completed': 340})
+    leaderboard = [
+        {'username': f'player{i}', 'level': 10, 'xp': 5000 - i, 'avatar': {'avatar_image': f'https://img/{i}.png'}}
+        for i in range(50)
+    ]
+    return {
+        'GET /user/profile': user,
+        'GET /user/stats': stats,
+        'GET /quests/active': {'items': quests, 'next_cursor': None},
+        'GET /dashboard': {'profile': user, 'stats': stats, 'active_quests': quests[:5], 'next_cursor': 'x', 'rank': 7},
+        'GET /leaderboard': leaderboard,
+        'GET /shop/items': [item.model_dump() for item in SHOP_ITEMS],
+    }
+
+
+def measure(number: int) -> list:
+    results = []
+    for endpoint, payload in payloads().items():
+        default = timeit.timeit(lambda: JSONResponse(jsonable_encoder(payload)).body, number=number)
+        fast = timeit.timeit(lambda: orjson.dumps(payload), number=number)
+        results.append({'endpoint': endpoint, 'default_us': default / number * 1e6, 'fast_us': fast / number * 1e6})
+
+    quest = Quest(**{k: v for k, v in _quest(str(uuid.uuid4()), 0).items()})
+    default = timeit.timeit(lambda: JSONResponse(jsonable_encoder(quest)).body, number=number)
+    fast = timeit.timeit(lambda: orjson.dumps(quest.model_dump()), number=number)
+    results.append({'endpoint': 'POST /quests/create', 'default_us': default / number * 1e6, 'fast_us': fast / number * 1e6})
+
+    for r in results:
+        r['default_us'] = round(r['default_us'], 2)
+        r['fast_us'] = round(r['fast_us'], 2)
+        r['speedup'] = round(r['default_us'] / r['fast_us'], 1) if r['fast_us'] else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=500)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = measure(args.number)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['endpoint']:<22} default {r['default_us']:>9} us  fast {r['fast_us']:>8} us  x{r['speedup']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""A small in-process Redis stand-in speaking RESP2, for exercising RespBackend.
+
+Supports PING, AUTH, SELECT, GET, SET (PX, EX, NX), DEL, INCR, PUBLISH and
+SUBSCRIBE; anything else gets an error reply. Single database, no persistence.
+
+Run from backend/:  python -m benchmarks.fake_redis --port 6390
+then point the app at it with CACHE_BACKEND=redis CACHE_URL=redis://localhost:6390/0
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from cache_backend import RespConnection
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[bytes, tuple] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self.commands = 0
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def _execute(self, args: list, writer: asyncio.StreamWriter) -> bytes:
+        name = args[0].upper()
+        if name == b'PING':
+            return b'+PONG\r\n'
+        if name in (b'AUTH', b'SELECT'):
+            return b'+OK\r\n'
+        if name == b'GET':
+            return self._bulk(self._get(args[1]))
+        if name == b'SET':
+            key, value, options = args[1], args[2], [a.upper() for a in args[3:]]
+            expires_at = None
+            if b'PX' in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b'PX') + 1]) / 1000
+            if b'EX' in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b'EX') + 1])
+            if b'NX' in options and self._get(key) is not None:
+                return b'$-1\r\n'
+            self.data[key] = (value, expires_at)
+            return b'+OK\r\n'
+        if name == b'DEL':
+            removed = 0
+            for key in args[1:]:
+                if self._get(key) is not None:
+                    del self.data[key]
+                    removed += 1
+            return b':%d\r\n' % removed
+        if name == b'INCR':
+            value = int(self._get(args[1]) or 0) + 1
+            self.data[args[1]] = (str(value).encode(), None)
+            return b':%d\r\n' % value
+        if name == b'PUBLISH':
+            frame = RespConnection.encode(b'message', args[1], args[2])
+            subscribers = self.channels.get(args[1], ())
+            for subscriber in subscribers:
+                subscriber.write(frame)
+            return b':%d\r\n' % len(subscribers)
+        if name == b'SUBSCRIBE':
+            replies = []
+            for i, channel in enumerate(args[1:], start=1):
+                self.channels[channel].add(writer)
+                replies.append(b'*3\r\n$9\r\nsubscribe\r\n' + self._bulk(channel) + b':%d\r\n' % i)
+            return b''.join(replies)
+        return b'-ERR unknown command %s\r\n' % name
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        conn = RespConnection(reader, writer)
+        self._clients.add(writer)
+        try:
+            while True:
+                args = await conn.read_reply()
+                self.commands += 1
+                writer.write(self._execute(args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            for writers in self.channels.values():
+                writers.discard(writer)
+            writer.close()
+
+
+async def _serve(host: str, port: int):
+    server = FakeRedis()
+    port = await server.start(host, port)
+    print(f"Fake Redis listening on {host}:{port}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
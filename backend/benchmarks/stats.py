@@ -0,0 +1,6 @@
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``; 0.0 when there are none."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,81 @@
+"""Concurrency stress test for POST /quests/{id}/complete against a running server.
+
+Every quest is completed by several concurrent requests at once. The run
+passes only if each quest was completed exactly once and the user's XP, gold
+and completed count equal the sum over quests, i.e. no lost or duplicated
+updates. Latency percentiles of the completion calls are reported.
+
+Needs httpx. Run from backend/ with the API up:
+    python -m benchmarks.stress_complete_quest --base-url http://localhost:8000/api
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+import httpx
+
+from benchmarks.stats import percentile
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://localhost:8000/api')
+    parser.add_argument('--quests', type=int, default=50)
+    parser.add_argument('--racers', type=int, default=5, help='concurrent completions per quest')
+    parser.add_argument('--xp', type=int, default=37)
+    parser.add_argument('--gold', type=int, default=11)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.quests * args.racers)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        name = f"stress_{uuid.uuid4().hex[:10]}"
+        r = await client.post('/auth/register', json={'email': f'{name}@example.com', 'password': 'StressPass123!', 'username': name})
+        r.raise_for_status()
+        headers = {'Authorization': f"Bearer {r.json()['token']}"}
+
+        quest_ids = []
+        for i in range(args.quests):
+            r = await client.post('/quests/create', headers=headers, json={
+                'title': f'Stress quest {i}', 'description': 'stress', 'quest_type': 'daily',
+                'difficulty': 'easy', 'xp_reward': args.xp, 'gold_reward': args.gold, 'category': 'productivity',
+            })
+            r.raise_for_status()
+            quest_ids.append(r.json()['id'])
+
+        latencies = []
+
+        async def complete(quest_id):
+            start = time.perf_counter()
+            response = await client.post(f'/quests/{quest_id}/complete', headers=headers)
+            latencies.append(time.perf_counter() - start)
+            return response.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(complete(q) for q in quest_ids for _ in range(args.racers)))
+        elapsed = time.perf_counter() - start
+
+        stats = (await client.get('/user/stats', headers=headers)).json()
+
+    expected = {'xp': args.quests * args.xp, 'gold': args.quests * args.gold, 'completed_quests': args.quests}
+    actual = {k: stats[k] for k in expected}
+    report = {
+        'requests': len(statuses),
+        'succeeded': statuses.count(200),
+        'rejected': statuses.count(400),
+        'other': len(statuses) - statuses.count(200) - statuses.count(400),
+        'expected': expected,
+        'actual': actual,
+        'throughput_rps': round(len(statuses) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+    report['passed'] = report['succeeded'] == args.quests and report['other'] == 0 and actual == expected
+    print(json.dumps(report, indent=2))
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
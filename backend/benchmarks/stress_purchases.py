@@ -0,0 +1,85 @@
+"""Concurrency stress test for POST /shop/purchase against a running server.
+
+A fresh user earns a known amount of gold by completing quests, then fires
+many more concurrent purchases than that gold can pay for. The run passes
+only if gold never goes negative, exactly ``gold // cost`` purchases
+succeeded, and the inventory holds exactly what was paid for.
+
+Needs httpx. Run from backend/ with the API up:
+    python -m benchmarks.stress_purchases --base-url http://localhost:8000/api
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+import httpx
+
+from benchmarks.stats import percentile
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://localhost:8000/api')
+    parser.add_argument('--item', default='health_potion')
+    parser.add_argument('--gold', type=int, default=1000, help='gold earned before the purchase burst')
+    parser.add_argument('--purchases', type=int, default=200)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.purchases)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        name = f"stress_{uuid.uuid4().hex[:10]}"
+        r = await client.post('/auth/register', json={'email': f'{name}@example.com', 'password': 'StressPass123!', 'username': name})
+        r.raise_for_status()
+        headers = {'Authorization': f"Bearer {r.json()['token']}"}
+
+        r = await client.post('/quests/create', headers=headers, json={
+            'title': 'Gold', 'description': 'stress', 'quest_type': 'daily',
+            'difficulty': 'easy', 'xp_reward': 1, 'gold_reward': args.gold, 'category': 'productivity',
+        })
+        r.raise_for_status()
+        (await client.post(f"/quests/{r.json()['id']}/complete", headers=headers)).raise_for_status()
+
+        items = {item['id']: item for item in (await client.get('/shop/items')).json()}
+        cost = items[args.item]['cost']
+
+        latencies = []
+
+        async def purchase():
+            start = time.perf_counter()
+            response = await client.post('/shop/purchase', headers=headers, json={'item_id': args.item})
+            latencies.append(time.perf_counter() - start)
+            return response.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(purchase() for _ in range(args.purchases)))
+        elapsed = time.perf_counter() - start
+
+        inventory = (await client.get('/inventory', headers=headers)).json()
+
+    affordable = min(args.gold // cost, args.purchases)
+    expected = {'gold': args.gold - affordable * cost, 'items': affordable}
+    actual = {'gold': inventory['gold'], 'items': inventory['inventory'].get(args.item, 0)}
+    report = {
+        'requests': len(statuses),
+        'succeeded': statuses.count(200),
+        'rejected': statuses.count(400),
+        'other': len(statuses) - statuses.count(200) - statuses.count(400),
+        'expected': expected,
+        'actual': actual,
+        'throughput_rps': round(len(statuses) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+    report['passed'] = (
+        actual['gold'] >= 0 and actual == expected
+        and report['succeeded'] == affordable and report['other'] == 0
+    )
+    print(json.dumps(report, indent=2))
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
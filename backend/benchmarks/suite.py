@@ -0,0 +1,210 @@
+"""Offline benchmark suite for the per-request helpers, models and routes.
+
+Micro benchmarks time the hot helpers directly (bcrypt, JWT, level maths,
+model construction and dumping). Route benchmarks send requests through an
+in-process ASGI client, with mongomock-motor standing in for MongoDB; they
+are skipped when mongomock-motor is not installed.
+
+Results can be saved as a named JSON baseline and later compared against;
+a case slower than its baseline by more than --threshold is a regression
+and makes the run exit non-zero.
+
+Run from backend/:
+    python -m benchmarks.suite --save main
+    python -m benchmarks.suite --compare main --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import date, datetime, timezone
+
+import orjson
+
+# The route cases run on mongomock, which has no transactions; set before server is imported
+os.environ.setdefault('QUEST_TRANSACTIONS', 'false')
+
+from passwords import BCRYPT_ROUNDS, hash_password, verify_password
+from progression import apply_reward, calculate_xp_for_level, level_for_xp
+from server import Quest, QuestCreate, User, create_token, decode_token
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def _time(fn, repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'median_us': round(statistics.median(runs) * 1e6, 3), 'min_us': round(min(runs) * 1e6, 3), 'loops': number}
+
+
+def micro_cases(rounds: int) -> dict:
+    hashed = hash_password('correct horse battery staple', rounds)
+    token = create_token('bench-user')
+    user = User(email='bench@example.com', username='bench')
+    user_dict = user.model_dump()
+    quest_fields = dict(
+        title='Read', description='Read 20 pages of a book before bed', quest_type='daily',
+        difficulty='medium', xp_reward=100, gold_reward=25, category='study',
+    )
+    quest = Quest(user_id=user.id, **quest_fields)
+    before = {'xp': 123_456, 'gold': 900, 'level': 20, 'streak': 4, 'last_quest_date': '2026-01-01'}
+    today = date(2026, 1, 2)
+    return {
+        f'hash_password(rounds={rounds})': lambda: hash_password('correct horse battery staple', rounds),
+        f'verify_password(rounds={rounds})': lambda: verify_password('correct horse battery staple', hashed),
+        'create_token': lambda: create_token('bench-user'),
+        'decode_token': lambda: decode_token(token),
+        'calculate_xp_for_level': lambda: calculate_xp_for_level(50),
+        'level_for_xp': lambda: level_for_xp(5_000_000, 1),
+        'apply_reward': lambda: apply_reward(before, 100, 25, today),
+        'User()': lambda: User(email='bench@example.com', username='bench'),
+        'User.model_dump': user.model_dump,
+        'User.model_validate': lambda: User.model_validate(user_dict),
+        'Quest()': lambda: Quest(user_id=user.id, **quest_fields),
+        'Quest.model_dump': quest.model_dump,
+        'QuestCreate.model_validate': lambda: QuestCreate.model_validate(quest_fields),
+        'orjson.dumps(User)': lambda: orjson.dumps(user_dict),
+    }
+
+
+def run_micro(repeat: int, min_time: float, rounds: int) -> dict:
+    results = {}
+    for name, fn in micro_cases(rounds).items():
+        results[name] = _time(fn, repeat if 'password' not in name else min(repeat, 3), min_time)
+    return results
+
+
+async def _route_results(requests: int) -> dict:
+    import httpx
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    server.db = AsyncMongoMockClient()['benchmarks']
+    transport = httpx.ASGITransport(app=server.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench/api') as client:
+        r = await client.post('/auth/register', json={'email': 'bench@example.com', 'password': 'BenchPass123!', 'username': 'bench'})
+        r.raise_for_status()
+        headers = {'Authorization': f"Bearer {r.json()['token']}"}
+        quest_body = {
+            'title': 'Read', 'description': 'Read 20 pages', 'quest_type': 'daily', 'difficulty': 'medium',
+            'xp_reward': 100, 'gold_reward': 25, 'category': 'study',
+        }
+
+        async def measure(name, send, count=requests):
+            samples = []
+            for i in range(count):
+                start = time.perf_counter()
+                response = await send(i)
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            results[name] = {
+                'median_us': round(statistics.median(samples) * 1e6, 3),
+                'min_us': round(min(samples) * 1e6, 3),
+                'loops': count,
+            }
+
+        created = []
+
+        async def create(i):
+            response = await client.post('/quests/create', json=quest_body, headers=headers)
+            created.append(response.json()['id'])
+            return response
+
+        await measure('POST /quests/create', create)
+        await measure('POST /quests/{id}/complete', lambda i: client.post(f'/quests/{created[i]}/complete', headers=headers))
+        await measure('GET /user/profile', lambda i: client.get('/user/profile', headers=headers))
+        await measure('GET /user/stats', lambda i: client.get('/user/stats', headers=headers))
+        await measure('GET /quests/completed', lambda i: client.get('/quests/completed', headers=headers))
+        await measure('GET /dashboard', lambda i: client.get('/dashboard', headers=headers))
+        await measure('GET /leaderboard', lambda i: client.get('/leaderboard'))
+        await measure('GET /shop/items', lambda i: client.get('/shop/items'))
+    return results
+
+
+def run_routes(requests: int) -> dict:
+    try:
+        import mongomock_motor  # noqa: F401
+    except ImportError:
+        print("mongomock-motor is not installed; skipping route benchmarks", file=sys.stderr)
+        return {}
+    return asyncio.run(_route_results(requests))
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    rows = []
+    for group in ('micro', 'routes'):
+        for name, result in current.get(group, {}).items():
+            base = baseline.get(group, {}).get(name)
+            if base is None:
+                rows.append({'case': name, 'status': 'new', 'median_us': result['median_us']})
+                continue
+            ratio = result['median_us'] / base['median_us'] if base['median_us'] else 1.0
+            rows.append({
+                'case': name,
+                'status': 'regression' if ratio > 1 + threshold else ('improved' if ratio < 1 - threshold else 'ok'),
+                'baseline_us': base['median_us'],
+                'median_us': result['median_us'],
+                'ratio': round(ratio, 3),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per micro benchmark repeat')
+    parser.add_argument('--rounds', type=int, default=BCRYPT_ROUNDS, help='bcrypt cost for the password cases')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route case')
+    parser.add_argument('--skip-routes', action='store_true')
+    parser.add_argument('--save', metavar='NAME', help='write results to baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare against baselines/NAME.json')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'micro': run_micro(args.repeat, args.min_time, args.rounds),
+        'routes': {} if args.skip_routes else run_routes(args.requests),
+    }
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f'{args.save}.json'), 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    rows = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            rows = compare(results, json.load(f), args.threshold)
+
+    if args.json:
+        print(json.dumps({**results, 'comparison': rows} if rows is not None else results, indent=2))
+    elif rows is not None:
+        for r in rows:
+            base = f"{r['baseline_us']:>12} us -> " if 'baseline_us' in r else ' ' * 19
+            print(f"{r['case']:<32} {base}{r['median_us']:>12} us  {r['status']}")
+    else:
+        for group in ('micro', 'routes'):
+            for name, r in results[group].items():
+                print(f"{name:<32} {r['median_us']:>12} us  (min {r['min_us']} us, {r['loops']} loops)")
+
+    if rows is not None and any(r['status'] == 'regression' for r in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
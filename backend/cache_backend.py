@@ -0,0 +1,512 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+from user_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Called with each message from another process, or None when messages may have been lost.
+MessageHandler = Callable[[Optional[bytes]], None]
+
+
+class CacheBackend(ABC):
+    """Byte-valued cache plus a broadcast channel between worker processes.
+
+    ``shared`` backends are seen by every worker, so a value one worker
+    writes can be read by another. ``publish`` reaches the other workers'
+    ``start`` handlers, never the publisher itself. Cache operations do not
+    raise on backend failures: a read becomes a miss and a failed write is
+    logged, so a cache outage falls back to MongoDB.
+    """
+
+    name = 'base'
+    shared = False
+    max_message = 1024
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex[:8].encode()
+        self.published = 0
+        self.received = 0
+        self.resets = 0
+        self._on_message: Optional[MessageHandler] = None
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float, nx: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def publish(self, message: bytes):
+        ...
+
+    def start(self, on_message: MessageHandler):
+        self._on_message = on_message
+
+    async def stop(self):
+        pass
+
+    def _frame(self, message: bytes) -> bytes:
+        if len(message) + len(self.origin) + 1 > self.max_message:
+            raise ValueError(f"Cache message longer than {self.max_message} bytes")
+        return self.origin + b' ' + message
+
+    def _deliver(self, frame: Optional[bytes]):
+        if frame is None:
+            self.resets += 1
+        elif frame.startswith(self.origin + b' '):
+            return
+        else:
+            self.received += 1
+            frame = frame.split(b' ', 1)[1]
+        if self._on_message is not None:
+            self._on_message(frame)
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.name,
+            'shared': self.shared,
+            'published': self.published,
+            'received': self.received,
+            'resets': self.resets,
+        }
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU. Nothing is shared, so with several workers each has its own."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self._cache = TTLCache(max_entries, ttl=float('inf'))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float, nx: bool = False) -> bool:
+        if nx and self._cache.peek(key) is not None:
+            return False
+        self._cache.set(key, value, ttl=ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    async def publish(self, message: bytes):
+        self._frame(message)
+        self.published += 1
+
+    def stats(self) -> dict:
+        return {**super().stats(), **self._cache.stats()}
+
+
+class MmapBackend(CacheBackend):
+    """Fixed-size hash table and message ring in a memory-mapped file.
+
+    For workers on one host: every worker maps the same file (by default in
+    /dev/shm) and takes an ``flock`` around each operation. The table is
+    direct-mapped, so a key evicts whatever hashed to its slot, and values
+    larger than a slot are not cached. Messages go into a ring of
+    ``ring_size`` entries that each worker polls; a worker that falls more
+    than a ring behind gets a reset. POSIX only.
+    """
+
+    name = 'mmap'
+    shared = True
+
+    MAGIC = b'LRPGCACHE1'
+    # magic, slots, slot size, ring size, message size, message sequence
+    HEADER = struct.Struct('<10s6xIIIIQ')
+    HEADER_SIZE = 64
+    # key hash, expires at (wall clock), key length, value length
+    SLOT = struct.Struct('<QdII')
+    # message sequence, length
+    MESSAGE = struct.Struct('<QI')
+    SEQ_OFFSET = 32
+
+    def __init__(self, path: str, slots: int, slot_size: int, ring_size: int, poll_interval: float):
+        super().__init__()
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self.too_large = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            self._file.seek(0)
+            header = self._file.read(self.HEADER_SIZE)
+            if len(header) == self.HEADER_SIZE and header.startswith(self.MAGIC):
+                # Another worker created it; its geometry wins.
+                _, slots, slot_size, ring_size, self.max_message, _ = self.HEADER.unpack_from(header)
+            else:
+                size = self.HEADER_SIZE + slots * slot_size + ring_size * (self.MESSAGE.size + self.max_message)
+                self._file.truncate(0)
+                self._file.truncate(size)
+                self._file.seek(0)
+                self._file.write(self.HEADER.pack(self.MAGIC, slots, slot_size, ring_size, self.max_message, 0))
+                self._file.flush()
+            self.slots, self.slot_size, self.ring_size = slots, slot_size, ring_size
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._ring_offset = self.HEADER_SIZE + slots * slot_size
+        self._last_seq = self._seq()
+
+    def _lock(self, exclusive: bool):
+        self._fcntl.flock(self._file, self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH)
+
+    def _unlock(self):
+        self._fcntl.flock(self._file, self._fcntl.LOCK_UN)
+
+    def _seq(self) -> int:
+        return struct.unpack_from('<Q', self._map, self.SEQ_OFFSET)[0]
+
+    def _slot(self, key: bytes) -> tuple:
+        # Python's hash() differs per process, so use a stable one
+        key_hash = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+        return key_hash, self.HEADER_SIZE + (key_hash % self.slots) * self.slot_size
+
+    def _read(self, key: bytes, key_hash: int, offset: int) -> Optional[bytes]:
+        stored_hash, expires_at, key_len, value_len = self.SLOT.unpack_from(self._map, offset)
+        if stored_hash != key_hash or expires_at <= time.time():
+            return None
+        start = offset + self.SLOT.size
+        if self._map[start:start + key_len] != key:
+            return None
+        return self._map[start + key_len:start + key_len + value_len]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raw_key = key.encode()
+        key_hash, offset = self._slot(raw_key)
+        self._lock(exclusive=False)
+        try:
+            value = self._read(raw_key, key_hash, offset)
+        finally:
+            self._unlock()
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float, nx: bool = False) -> bool:
+        raw_key = key.encode()
+        if self.SLOT.size + len(raw_key) + len(value) > self.slot_size:
+            self.too_large += 1
+            return False
+        key_hash, offset = self._slot(raw_key)
+        self._lock(exclusive=True)
+        try:
+            if nx and self._read(raw_key, key_hash, offset) is not None:
+                return False
+            self.SLOT.pack_into(self._map, offset, key_hash, time.time() + ttl, len(raw_key), len(value))
+            start = offset + self.SLOT.size
+            self._map[start:start + len(raw_key) + len(value)] = raw_key + value
+        finally:
+            self._unlock()
+        return True
+
+    async def delete(self, key: str):
+        raw_key = key.encode()
+        key_hash, offset = self._slot(raw_key)
+        self._lock(exclusive=True)
+        try:
+            if self._read(raw_key, key_hash, offset) is not None:
+                self.SLOT.pack_into(self._map, offset, 0, 0.0, 0, 0)
+        finally:
+            self._unlock()
+
+    def _message_offset(self, seq: int) -> int:
+        return self._ring_offset + (seq % self.ring_size) * (self.MESSAGE.size + self.max_message)
+
+    async def publish(self, message: bytes):
+        frame = self._frame(message)
+        self._lock(exclusive=True)
+        try:
+            seq = self._seq() + 1
+            offset = self._message_offset(seq)
+            self.MESSAGE.pack_into(self._map, offset, seq, len(frame))
+            self._map[offset + self.MESSAGE.size:offset + self.MESSAGE.size + len(frame)] = frame
+            struct.pack_into('<Q', self._map, self.SEQ_OFFSET, seq)
+        finally:
+            self._unlock()
+        self.published += 1
+
+    def poll(self):
+        """Delivers the messages published since the last poll."""
+        if self._seq() == self._last_seq:
+            return
+        self._lock(exclusive=False)
+        try:
+            seq = self._seq()
+            if seq - self._last_seq > self.ring_size:
+                frames = None
+            else:
+                frames = []
+                for s in range(self._last_seq + 1, seq + 1):
+                    offset = self._message_offset(s)
+                    _, length = self.MESSAGE.unpack_from(self._map, offset)
+                    frames.append(self._map[offset + self.MESSAGE.size:offset + self.MESSAGE.size + length])
+        finally:
+            self._unlock()
+        self._last_seq = seq
+        if frames is None:
+            self._deliver(None)
+        else:
+            for frame in frames:
+                self._deliver(frame)
+
+    def start(self, on_message: MessageHandler):
+        super().start(on_message)
+        self._last_seq = self._seq()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Cache message poll failed: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            'slots': self.slots,
+            'hits': self.hits,
+            'misses': self.misses,
+            'too_large': self.too_large,
+        }
+
+
+class RespError(Exception):
+    pass
+
+
+class RespConnection:
+    """One connection speaking RESP2, the Redis wire protocol."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host: str, port: int, password: Optional[str], db: int, timeout: float) -> 'RespConnection':
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        conn = cls(reader, writer)
+        if password:
+            await conn.command('AUTH', password)
+        if db:
+            await conn.command('SELECT', db)
+        return conn
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply {line!r}")
+
+    async def command(self, *args):
+        self.writer.write(self.encode(*args))
+        await self.writer.drain()
+        return await self.read_reply()
+
+    def close(self):
+        self.writer.close()
+
+
+class RespBackend(CacheBackend):
+    """Redis (or anything speaking its protocol), shared across hosts.
+
+    Commands go through a small connection pool; messages use PUBLISH and a
+    dedicated SUBSCRIBE connection, which reconnects with backoff and sends
+    a reset after every reconnect since messages may have been missed.
+    """
+
+    name = 'redis'
+    shared = True
+
+    def __init__(self, url: str, pool_size: int, timeout: float, channel: str):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.channel = channel
+        self.errors = 0
+        self._idle: List[RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _connect(self) -> RespConnection:
+        return await RespConnection.open(self.host, self.port, self.password, self.db, self.timeout)
+
+    async def execute(self, *args):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                reply = await asyncio.wait_for(conn.command(*args), self.timeout)
+            except BaseException:
+                # A timed-out or broken connection may still get its reply later.
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def _safe(self, default, *args):
+        try:
+            return await self.execute(*args)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, RespError) as e:
+            self.errors += 1
+            logger.error(f"Cache command {args[0]} failed: {e}")
+            return default
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._safe(None, 'GET', key)
+
+    async def set(self, key: str, value: bytes, ttl: float, nx: bool = False) -> bool:
+        args = ['SET', key, value, 'PX', max(1, int(ttl * 1000))]
+        if nx:
+            args.append('NX')
+        return await self._safe(None, *args) is not None
+
+    async def delete(self, key: str):
+        await self._safe(0, 'DEL', key)
+
+    async def publish(self, message: bytes):
+        await self._safe(0, 'PUBLISH', self.channel, self._frame(message))
+        self.published += 1
+
+    def start(self, on_message: MessageHandler):
+        super().start(on_message)
+        self._task = asyncio.create_task(self._subscribe())
+
+    async def _subscribe(self):
+        delay = 0.1
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await self._connect()
+                await conn.command('SUBSCRIBE', self.channel)
+                if not first:
+                    self._deliver(None)
+                first = False
+                delay = 0.1
+                while True:
+                    reply = await conn.read_reply()
+                    if isinstance(reply, list) and reply[0] == b'message':
+                        self._deliver(reply[2])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Cache subscription lost, reconnecting in {delay:.1f}s: {e}")
+                first = False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'errors': self.errors, 'idle_connections': len(self._idle)}
+
+
+def _default_mmap_path() -> str:
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f"liferpg-cache-{os.getenv('DB_NAME', 'default')}")
+
+
+def create_cache_backend() -> CacheBackend:
+    kind = os.getenv('CACHE_BACKEND', 'memory')
+    if kind == 'memory':
+        return MemoryBackend(max_entries=int(os.getenv('CACHE_MEMORY_ENTRIES', '10000')))
+    if kind == 'mmap':
+        return MmapBackend(
+            path=os.getenv('CACHE_MMAP_PATH') or _default_mmap_path(),
+            slots=int(os.getenv('CACHE_MMAP_SLOTS', '16384')),
+            slot_size=int(os.getenv('CACHE_MMAP_SLOT_SIZE', '4096')),
+            ring_size=int(os.getenv('CACHE_MMAP_RING', '1024')),
+            poll_interval=float(os.getenv('CACHE_POLL_MS', '50')) / 1000,
+        )
+    if kind == 'redis':
+        return RespBackend(
+            url=os.getenv('CACHE_URL', 'redis://localhost:6379/0'),
+            pool_size=int(os.getenv('CACHE_POOL_SIZE', '8')),
+            timeout=float(os.getenv('CACHE_TIMEOUT', '0.5')),
+            channel=os.getenv('CACHE_CHANNEL', 'liferpg:invalidate'),
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}; use memory, mmap or redis")
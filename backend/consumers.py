@@ -0,0 +1,159 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from events import Consumer
+from leaderboard import PROJECTION
+
+# (badge, metric, threshold); metrics come from the event or the user's rollup
+BADGES = [
+    ('first_quest', 'completed', 1),
+    ('quest_10', 'completed', 10),
+    ('quest_100', 'completed', 100),
+    ('streak_7', 'streak', 7),
+    ('streak_30', 'streak', 30),
+    ('level_5', 'level', 5),
+    ('level_10', 'level', 10),
+    ('scholar', 'category:study', 10),
+    ('athlete', 'category:fitness', 10),
+]
+
+
+def _category_key(category: Optional[str]) -> str:
+    # Categories are user input and end up in a field path.
+    return (category or 'other').replace('.', '_').lstrip('$') or 'other'
+
+
+class RollupConsumer(Consumer):
+    """Per-user totals and per-category completion counts in ``user_rollups``.
+
+    Each rollup remembers the last event it counted, so a batch replayed
+    after a crash before its checkpoint is not counted twice. ``badges``
+    runs on the same batch once the rollups include it, so count-based
+    badges never read totals that trail the events.
+    """
+
+    name = 'rollups'
+
+    def __init__(self, db, badges: Optional['BadgeAwarder'] = None):
+        self.db = db
+        self.badges = badges
+
+    async def handle(self, events: List[dict]):
+        user_ids = list({e['user_id'] for e in events})
+        seen = {
+            doc['_id']: doc.get('last_event')
+            async for doc in self.db.user_rollups.find({'_id': {'$in': user_ids}}, {'last_event': 1})
+        }
+
+        increments: Dict[str, dict] = {}
+        last_event = {}
+        for event in events:
+            user_id = event['user_id']
+            if seen.get(user_id) is not None and event['_id'] <= seen[user_id]:
+                continue
+            inc = increments.setdefault(user_id, {'completed': 0, 'xp': 0, 'gold': 0})
+            inc['completed'] += 1
+            inc['xp'] += event['xp_gained']
+            inc['gold'] += event['gold_gained']
+            key = f"by_category.{_category_key(event.get('category'))}"
+            inc[key] = inc.get(key, 0) + 1
+            last_event[user_id] = event['_id']
+
+        if increments:
+            await self.db.user_rollups.bulk_write([
+                UpdateOne(
+                    {'_id': user_id, 'last_event': seen.get(user_id)},
+                    {'$inc': inc, '$set': {'last_event': last_event[user_id]}},
+                    upsert=True
+                )
+                for user_id, inc in increments.items()
+            ], ordered=False)
+
+        # Also on a replayed batch: awarding is idempotent, and the crash may have come before it
+        if self.badges is not None:
+            await self.badges.award(events)
+
+
+class BadgeAwarder:
+    """Awards ``BADGES`` into ``users.badges``; run by ``RollupConsumer`` after each rollup write."""
+
+    def __init__(self, db, on_awarded: Optional[Callable[[str, List[str]], Awaitable[None]]] = None):
+        self.db = db
+        self.on_awarded = on_awarded
+
+    async def award(self, events: List[dict]):
+        latest: Dict[str, dict] = {}
+        for event in events:
+            metrics = latest.setdefault(event['user_id'], {'streak': 0, 'level': 0})
+            metrics['streak'] = max(metrics['streak'], event['streak'])
+            metrics['level'] = max(metrics['level'], event['level'])
+
+        user_ids = list(latest)
+        rollups = {
+            doc['_id']: doc
+            async for doc in self.db.user_rollups.find({'_id': {'$in': user_ids}}, {'completed': 1, 'by_category': 1})
+        }
+        owned = {
+            doc['id']: set(doc.get('badges') or [])
+            async for doc in self.db.users.find({'id': {'$in': user_ids}}, {'_id': 0, 'id': 1, 'badges': 1})
+        }
+
+        awards = {}
+        for user_id, metrics in latest.items():
+            rollup = rollups.get(user_id, {})
+            metrics['completed'] = rollup.get('completed', 0)
+            for category, count in (rollup.get('by_category') or {}).items():
+                metrics[f'category:{category}'] = count
+            new = [
+                badge for badge, metric, threshold in BADGES
+                if metrics.get(metric, 0) >= threshold and badge not in owned.get(user_id, ())
+            ]
+            if new and user_id in owned:
+                awards[user_id] = new
+
+        if awards:
+            await self.db.users.bulk_write([
+                UpdateOne({'id': user_id}, {'$addToSet': {'badges': {'$each': badges}}})
+                for user_id, badges in awards.items()
+            ], ordered=False)
+            if self.on_awarded:
+                for user_id, badges in awards.items():
+                    await self.on_awarded(user_id, badges)
+
+
+class LeaderboardConsumer(Consumer):
+    """Applies progress made in other workers to this worker's ``Leaderboard``."""
+
+    name = 'leaderboard'
+    shared = False
+
+    def __init__(self, db, leaderboard, on_change: Optional[Callable[[], None]] = None):
+        self.db = db
+        self.leaderboard = leaderboard
+        self.on_change = on_change
+
+    async def handle(self, events: List[dict]):
+        progress: Dict[str, dict] = {}
+        for event in events:
+            current = progress.get(event['user_id'])
+            if current is None or event['xp'] > current['xp']:
+                progress[event['user_id']] = {'xp': event['xp'], 'level': event['level']}
+
+        # Users registered in another worker are not in this leaderboard yet.
+        unknown = [user_id for user_id in progress if self.leaderboard.entry(user_id) is None]
+        if unknown:
+            async for doc in self.db.users.find({'id': {'$in': unknown}}, PROJECTION):
+                fields = {'username': doc.get('username'), 'xp': doc.get('xp', 0), 'level': doc.get('level', 1)}
+                if doc.get('avatar'):
+                    fields['avatar_image'] = doc['avatar'].get('avatar_image')
+                self.leaderboard.upsert(doc['id'], **fields)
+
+        changed = bool(unknown)
+        for user_id, fields in progress.items():
+            entry = self.leaderboard.entry(user_id)
+            if entry is not None and fields['xp'] > entry['xp']:
+                self.leaderboard.upsert(user_id, **fields)
+                changed = True
+        if changed and self.on_change:
+            self.on_change()
@@ -0,0 +1,59 @@
+import hashlib
+import uuid
+from typing import Dict, Optional
+
+from starlette.responses import Response
+
+
+class Versions:
+    """Change counters for cacheable resources, bumped by the routes that write them.
+
+    An ETag is the process boot id plus the counter, so it can be checked
+    without reading the resource. The boot id keeps a restarted (or a
+    different) worker from ever matching an ETag it did not issue.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:12]
+        # Only keys that have been written; etag() must not add one per id it is asked about
+        self._versions: Dict[str, int] = {}
+
+    def bump(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def rotate(self):
+        # Invalidates every ETag issued so far, for when changes may have been missed.
+        self.boot_id = uuid.uuid4().hex[:12]
+
+    def etag(self, key: str) -> str:
+        return f'W/"{self.boot_id}-{self._versions.get(key, 0)}"'
+
+
+def static_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Comparison for If-None-Match is always weak (RFC 9110 13.1.2)
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+
+
+def with_etag(response: Response, etag: str, cache_control: str) -> Response:
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+QUEST_COMPLETED = 'quest_completed'
+
+
+def quest_completed_event(user_id: str, quest: dict, xp_gained: int, gold_gained: int, after: dict) -> dict:
+    return {
+        'type': QUEST_COMPLETED,
+        'user_id': user_id,
+        'quest_id': quest['id'],
+        'category': quest.get('category'),
+        'xp_gained': xp_gained,
+        'gold_gained': gold_gained,
+        'xp': after['xp'],
+        'level': after['level'],
+        'streak': after['streak'],
+        'created_at': datetime.now(timezone.utc),
+    }
+
+
+class Consumer(ABC):
+    """Handles batches of events in ``_id`` order.
+
+    A shared consumer runs in one worker at a time and checkpoints in
+    ``jobs``; a local one runs in every worker from the moment it started,
+    for state that lives in process memory.
+    """
+
+    name = 'consumer'
+    shared = True
+
+    @abstractmethod
+    async def handle(self, events: List[dict]):
+        ...
+
+
+class EventProcessor:
+    """Polls the ``events`` outbox and feeds each consumer in batches.
+
+    ObjectIds from different workers are only ordered to the second, so a
+    consumer only reads events older than ``settle_seconds``; by then every
+    insert with a smaller ``_id`` has landed and a checkpoint never skips one.
+    """
+
+    def __init__(self, db, consumers: List[Consumer], batch_size: int, poll_interval: float,
+                 settle_seconds: float = 5, lease_seconds: float = 60):
+        self.db = db
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.settle = timedelta(seconds=settle_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = uuid.uuid4().hex
+        self.processed = {c.name: 0 for c in consumers}
+        self.failures = {c.name: 0 for c in consumers}
+        self.positions = {}
+        self._tasks = []
+
+    async def _acquire(self, consumer: Consumer) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.db.jobs.find_one_and_update(
+                {'_id': f'consumer:{consumer.name}', '$or': [
+                    {'lease_until': {'$exists': False}},
+                    {'lease_until': {'$lt': now}},
+                    {'owner': self.owner},
+                ]},
+                {'$set': {'owner': self.owner, 'lease_until': now + self.lease}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def poll(self, consumer: Consumer) -> int:
+        """Hand one batch to ``consumer``; returns how many events it got."""
+        if consumer.shared:
+            job = await self._acquire(consumer)
+            if job is None:
+                return 0
+            after = job.get('after')
+        else:
+            after = self.positions[consumer.name]
+
+        bounds = {'$lt': ObjectId.from_datetime(datetime.now(timezone.utc) - self.settle)}
+        if after is not None:
+            bounds['$gt'] = after
+        events = await self.db.events.find({'_id': bounds}).sort('_id', 1).limit(self.batch_size).to_list(self.batch_size)
+        if not events:
+            return 0
+
+        await consumer.handle(events)
+        after = events[-1]['_id']
+        if consumer.shared:
+            await self.db.jobs.update_one(
+                {'_id': f'consumer:{consumer.name}', 'owner': self.owner},
+                {'$set': {'after': after, 'updated_at': datetime.now(timezone.utc)}}
+            )
+        else:
+            self.positions[consumer.name] = after
+        self.processed[consumer.name] += len(events)
+        return len(events)
+
+    async def _run(self, consumer: Consumer):
+        while True:
+            try:
+                count = await self.poll(consumer)
+            except Exception as e:
+                # The checkpoint did not move, so the batch is retried.
+                self.failures[consumer.name] += 1
+                logger.error(f"Event consumer {consumer.name} failed: {e}")
+                count = 0
+            if count < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        started = ObjectId.from_datetime(datetime.now(timezone.utc) - 2 * self.settle)
+        for consumer in self.consumers:
+            if not consumer.shared:
+                self.positions[consumer.name] = started
+            self._tasks.append(asyncio.create_task(self._run(consumer)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            'batch_size': self.batch_size,
+            'consumers': {
+                c.name: {'shared': c.shared, 'processed': self.processed[c.name], 'failures': self.failures[c.name]}
+                for c in self.consumers
+            },
+        }
+
+
+def create_event_processor(db, consumers: List[Consumer]) -> EventProcessor:
+    return EventProcessor(
+        db,
+        consumers,
+        batch_size=int(os.getenv('EVENT_BATCH_SIZE', '500')),
+        poll_interval=float(os.getenv('EVENT_POLL_INTERVAL', '1')),
+    )
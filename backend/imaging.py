@@ -0,0 +1,121 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'BMP'}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImagePoolBusy(RuntimeError):
+    pass
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    out = io.BytesIO()
+    img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def normalize_image(data: bytes, max_side: int = 1600, thumb_side: int = 256,
+                    quality: int = 85, max_pixels: int = 40_000_000) -> dict:
+    """Validate an upload and re-encode it as a bounded JPEG plus a thumbnail.
+
+    Runs inside the worker processes, so it must stay a top-level function
+    and only raise picklable exceptions.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if img.format not in ALLOWED_FORMATS:
+                raise InvalidImage(f"Unsupported image format: {img.format}")
+            if img.width * img.height > max_pixels:
+                raise InvalidImage(f"Image is too large: {img.width}x{img.height}")
+
+            # Let the JPEG decoder scale down by a power of two while decoding.
+            img.draft('RGB', (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            image = _encode_jpeg(img, quality)
+            width, height = img.size
+
+            img.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+            thumbnail = _encode_jpeg(img, quality)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        if isinstance(e, InvalidImage):
+            raise
+        raise InvalidImage(f"Could not decode image: {e}") from None
+
+    return {'image': image, 'thumbnail': thumbnail, 'width': width, 'height': height}
+
+
+class ImagePipeline:
+    """Runs ``normalize_image`` in a bounded process pool.
+
+    At most ``max_pending`` images are admitted at once (running plus
+    queued); beyond that ``process`` raises ``ImagePoolBusy`` immediately
+    instead of letting the executor queue grow.
+    """
+
+    def __init__(self, workers: int, max_pending: int, **options):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.options = options
+        self.pending = 0
+        self.processed = 0
+        self.rejected = 0
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def process(self, data: bytes) -> dict:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ImagePoolBusy(f"{self.pending} images already in flight")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, partial(normalize_image, data, **self.options))
+        finally:
+            self.pending -= 1
+        self.processed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'processed': self.processed,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_image_pipeline() -> ImagePipeline:
+    workers = int(os.getenv('IMAGE_WORKERS', str(min(4, os.cpu_count() or 1))))
+    return ImagePipeline(
+        workers=workers,
+        max_pending=int(os.getenv('IMAGE_MAX_PENDING', str(workers * 2))),
+        max_side=int(os.getenv('IMAGE_MAX_SIDE', '1600')),
+        thumb_side=int(os.getenv('IMAGE_THUMB_SIDE', '256')),
+        quality=int(os.getenv('IMAGE_QUALITY', '85')),
+    )
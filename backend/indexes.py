@@ -0,0 +1,153 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# One entry per query shape used in server.py. Names are fixed so that
+# the bootstrap can diff them against what the server already has.
+INDEXES: Dict[str, List[IndexModel]] = {
+    'users': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+        IndexModel([('xp', DESCENDING)], name='xp_desc'),
+        # Streak decay scan; only users with a live streak are indexed
+        IndexModel(
+            [('last_quest_date', ASCENDING), ('id', ASCENDING)],
+            name='streak_last_quest_date_id',
+            partialFilterExpression={'streak': {'$gt': 0}},
+        ),
+    ],
+    'quests': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        # Keyset pagination of active / completed quests, with id as tie-breaker
+        IndexModel(
+            [('user_id', ASCENDING), ('status', ASCENDING), ('created_at', ASCENDING), ('id', ASCENDING)],
+            name='user_status_created_at_id',
+        ),
+        IndexModel(
+            [('user_id', ASCENDING), ('status', ASCENDING), ('completed_at', DESCENDING), ('id', DESCENDING)],
+            name='user_status_completed_at_id',
+        ),
+    ],
+    'events': [
+        # Outbox retention; consumers only ever read by _id
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=90 * 24 * 3600),
+    ],
+    'photos.files': [
+        # One file per content hash; the upload that loses a concurrent rename deletes itself
+        IndexModel([('filename', ASCENDING)], name='filename_unique', unique=True),
+        # What GridFS creates on first upload, declared so it is not reported as drift
+        IndexModel([('filename', ASCENDING), ('uploadDate', ASCENDING)], name='filename_1_uploadDate_1'),
+    ],
+    'friends': [
+        # Also what makes /friends/add idempotent
+        IndexModel([('user_id', ASCENDING), ('friend_id', ASCENDING)], name='user_friend_unique', unique=True),
+        # Followers of a user, for push fan-out
+        IndexModel([('friend_id', ASCENDING), ('user_id', ASCENDING)], name='friend_user'),
+    ],
+}
+
+
+# Unique indexes whose duplicates are safe to drop before creating them: a
+# friendship stored twice (before the index made /friends/add idempotent) is
+# still one friendship, and photos with the same name have the same bytes.
+# Duplicate users are never dropped; they fail startup.
+DEDUPE_BEFORE_CREATE: Dict[str, List[str]] = {
+    'friends': ['user_friend_unique'],
+    'photos.files': ['filename_unique'],
+}
+
+# Documents owned by a deduped one, as (collection, field holding its _id)
+DEDUPE_CASCADE: Dict[str, tuple] = {
+    'photos.files': ('photos.chunks', 'files_id'),
+}
+
+
+class IndexBootstrapError(RuntimeError):
+    pass
+
+
+async def dedupe(collection, fields: List[str], cascade=None) -> int:
+    """Delete all but the first document of each group sharing ``fields``; returns how many went.
+
+    ``cascade`` is ``(collection, field)`` for documents to delete along with them.
+    """
+    extra = []
+    pipeline = [
+        {'$sort': {'_id': 1}},
+        {'$group': {'_id': {f: f'${f}' for f in fields}, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        extra.extend(group['ids'][1:])
+    for i in range(0, len(extra), 1000):
+        if cascade is not None:
+            await cascade[0].delete_many({cascade[1]: {'$in': extra[i:i + 1000]}})
+        await collection.delete_many({'_id': {'$in': extra[i:i + 1000]}})
+    return len(extra)
+
+
+def _same_index(model: IndexModel, info: dict) -> bool:
+    doc = model.document
+    return (
+        list(doc['key'].items()) == [tuple(k) for k in info['key']]
+        and bool(doc.get('unique', False)) == bool(info.get('unique', False))
+    )
+
+
+async def ensure_indexes(db, specs: Dict[str, List[IndexModel]] = INDEXES) -> None:
+    """Create any missing index from ``specs`` and report drift.
+
+    Indexes on the server that are not declared here are only logged, never
+    dropped. A declared index that exists with a different definition, or a
+    failed creation (e.g. duplicate emails blocking a unique index), raises
+    ``IndexBootstrapError`` so the app refuses to start; only the indexes in
+    ``DEDUPE_BEFORE_CREATE`` get their duplicates removed first. ``ConnectionFailure``
+    is raised as is, since an unreachable server is worth retrying.
+    """
+    for collection, models in specs.items():
+        try:
+            existing = await db[collection].index_information()
+        except ConnectionFailure:
+            # An outage, not a bad index; the caller may retry
+            raise
+        except PyMongoError as e:
+            raise IndexBootstrapError(f"Could not list indexes on {collection}: {e}") from e
+
+        declared = {m.document['name']: m for m in models}
+
+        for name in existing:
+            if name != '_id_' and name not in declared:
+                logger.warning(f"Extra index {collection}.{name} is not declared in indexes.py")
+
+        missing = []
+        for name, model in declared.items():
+            if name not in existing:
+                missing.append(model)
+            elif not _same_index(model, existing[name]):
+                raise IndexBootstrapError(
+                    f"Index {collection}.{name} exists with a different definition: {existing[name]}"
+                )
+
+        if not missing:
+            continue
+
+        logger.info(f"Creating missing indexes on {collection}: {[m.document['name'] for m in missing]}")
+        try:
+            for model in missing:
+                if model.document['name'] in DEDUPE_BEFORE_CREATE.get(collection, ()):
+                    cascade = DEDUPE_CASCADE.get(collection)
+                    if cascade is not None:
+                        cascade = (db[cascade[0]], cascade[1])
+                    removed = await dedupe(db[collection], list(model.document['key']), cascade)
+                    if removed:
+                        logger.warning(f"Removed {removed} duplicates from {collection} before creating {model.document['name']}")
+            await db[collection].create_indexes(missing)
+        except ConnectionFailure:
+            raise
+        except PyMongoError as e:
+            raise IndexBootstrapError(f"Failed to create indexes on {collection}: {e}") from e
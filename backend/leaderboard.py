@@ -0,0 +1,84 @@
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Same fields the old sorted Mongo query projected
+PROJECTION = {'_id': 0, 'id': 1, 'username': 1, 'level': 1, 'xp': 1, 'avatar.avatar_image': 1}
+
+
+class Leaderboard:
+    """All users ordered by XP, kept in memory and updated in place.
+
+    ``_keys`` is a sorted array of ``(-xp, user_id)``, so rank lookup is a
+    binary search and a page is a slice. Moving one user costs a bisect plus
+    a list insert/delete, which is a memmove even for a few million users.
+    """
+
+    def __init__(self):
+        self._keys: List[tuple] = []
+        self._entries: Dict[str, dict] = {}
+        # Upserts and removals made while a rebuild scans; None when not rebuilding
+        self._changes: Optional[List[tuple]] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def rebuild(self, db, batch_size: int = 5000):
+        start = time.perf_counter()
+        entries = {}
+        self._changes = []
+        try:
+            async for doc in db.users.find({}, PROJECTION, batch_size=batch_size):
+                entries[doc.pop('id')] = doc
+        finally:
+            changes, self._changes = self._changes, None
+        self._entries = entries
+        self._keys = sorted((-e.get('xp', 0), user_id) for user_id, e in entries.items())
+        # The scan may have read these users before they changed, so replay the changes on top
+        for user_id, fields in changes:
+            if fields is None:
+                self.remove(user_id)
+            else:
+                self.upsert(user_id, **fields)
+        logger.info(f"Leaderboard rebuilt with {len(self._keys)} users in {time.perf_counter() - start:.2f}s")
+
+    def upsert(self, user_id: str, **fields):
+        if self._changes is not None:
+            self._changes.append((user_id, dict(fields)))
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = {'username': fields.get('username'), 'level': 1, 'xp': 0}
+            self._entries[user_id] = entry
+            bisect.insort(self._keys, (0, user_id))
+
+        old_key = (-entry['xp'], user_id)
+        if 'avatar_image' in fields:
+            entry['avatar'] = {'avatar_image': fields.pop('avatar_image')}
+        entry.update(fields)
+
+        new_key = (-entry['xp'], user_id)
+        if new_key != old_key:
+            del self._keys[bisect.bisect_left(self._keys, old_key)]
+            bisect.insort(self._keys, new_key)
+
+    def remove(self, user_id: str):
+        if self._changes is not None:
+            self._changes.append((user_id, None))
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-entry['xp'], user_id))]
+
+    def entry(self, user_id: str) -> Optional[dict]:
+        return self._entries.get(user_id)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return bisect.bisect_left(self._keys, (-entry['xp'], user_id)) + 1
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        return [self._entries[user_id] for _, user_id in self._keys[offset:offset + limit]]
@@ -0,0 +1,246 @@
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Most DB calls listed in one Server-Timing header
+TRACE_MAX_CALLS = 50
+
+# DB calls of the sampled request running in this context; Motor copies the
+# context into its executor threads, so the command listener sees it too.
+_trace: ContextVar[Optional[List[tuple]]] = ContextVar('metrics_trace', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Observed from the event loop and from Motor's executor threads
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (last one is +Inf), then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), labels + (le,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {cumulative}'
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command per collection and operation and logs slow ones."""
+
+    def __init__(self, metrics: 'Metrics', slow_seconds: float):
+        self.metrics = metrics
+        self.slow_seconds = slow_seconds
+        self._pending: Dict[tuple, Tuple[str, Optional[list]]] = {}
+
+    @staticmethod
+    def _collection(event: monitoring.CommandStartedEvent) -> str:
+        target = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        return target if isinstance(target, str) else '-'
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        self._pending[(event.connection_id, event.request_id)] = (self._collection(event), _trace.get())
+
+    def _finished(self, event, failed: bool):
+        collection, trace = self._pending.pop((event.connection_id, event.request_id), ('-', None))
+        seconds = event.duration_micros / 1e6
+        self.metrics.db_duration.observe(seconds, collection, event.command_name)
+        if failed:
+            self.metrics.db_failures.inc(collection, event.command_name)
+        if trace is not None:
+            trace.append((collection, event.command_name, seconds))
+        if seconds >= self.slow_seconds:
+            self.metrics.db_slow.inc(collection, event.command_name)
+            logger.warning(f"Slow MongoDB command: {event.command_name} on {collection} took {seconds * 1000:.1f}ms")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, failed=True)
+
+
+class Metrics:
+    def __init__(self, slow_seconds: float, trace_sample: float):
+        self.trace_sample = trace_sample
+        self.in_flight = 0
+        self.http_duration = Histogram(
+            'http_request_duration_seconds', 'HTTP request latency by route.',
+            ('method', 'route', 'status'), LATENCY_BUCKETS
+        )
+        self.http_size = Histogram(
+            'http_response_size_bytes', 'HTTP response body size by route.',
+            ('method', 'route'), SIZE_BUCKETS
+        )
+        self.db_duration = Histogram(
+            'mongodb_command_duration_seconds', 'MongoDB command latency by collection and command.',
+            ('collection', 'command'), DB_BUCKETS
+        )
+        self.db_failures = Counter(
+            'mongodb_command_failures_total', 'MongoDB commands that returned an error.', ('collection', 'command')
+        )
+        self.db_slow = Counter(
+            'mongodb_slow_commands_total', 'MongoDB commands slower than MONGO_SLOW_MS.', ('collection', 'command')
+        )
+        self.command_listener = MongoCommandListener(self, slow_seconds)
+
+    def sampled(self) -> bool:
+        return self.trace_sample > 0 and random.random() < self.trace_sample
+
+    def render(self, components: Optional[Dict[str, dict]] = None) -> str:
+        lines = [
+            '# HELP http_requests_in_flight HTTP requests currently being served.',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {self.in_flight}',
+        ]
+        for metric in (self.http_duration, self.http_size, self.db_duration, self.db_failures, self.db_slow):
+            lines.extend(metric.render())
+        if components:
+            # Numeric values from the components' stats() as one gauge family
+            lines.append('# HELP app_component_stat Internal component counters and gauges.')
+            lines.append('# TYPE app_component_stat gauge')
+            for component, stats in sorted(components.items()):
+                for name, value in sorted(stats.items()):
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        lines.append(f'app_component_stat{_labels(("component", "name"), (component, name))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _server_timing(trace: List[tuple], total: float) -> bytes:
+    parts = [f'db;dur={sum(t[2] for t in trace) * 1000:.2f};desc="{len(trace)} calls"']
+    parts.extend(
+        f'db{i};dur={seconds * 1000:.2f};desc="{collection}.{command}"'
+        for i, (collection, command, seconds) in enumerate(trace[:TRACE_MAX_CALLS])
+    )
+    parts.append(f'app;dur={total * 1000:.2f}')
+    return ', '.join(parts).encode('latin-1', 'replace')
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and response sizes per route.
+
+    Routes are labelled by their template (``/api/quests/{quest_id}/complete``),
+    unmatched paths as ``unmatched``, so label cardinality stays bounded. A
+    sampled request gets a ``Server-Timing`` header listing its DB calls.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        start = time.perf_counter()
+        trace = [] if metrics.sampled() else None
+        token = _trace.set(trace)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if trace is not None:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', _server_timing(trace, time.perf_counter() - start)))
+                    message = {**message, 'headers': headers}
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            _trace.reset(token)
+            route = scope.get('route')
+            label = getattr(route, 'path', None) or 'unmatched'
+            elapsed = time.perf_counter() - start
+            metrics.http_duration.observe(elapsed, scope['method'], label, str(status))
+            metrics.http_size.observe(size, scope['method'], label)
+            if trace is not None:
+                logger.info(
+                    f"Trace {scope['method']} {label} {status} {elapsed * 1000:.1f}ms: "
+                    + (', '.join(f"{c}.{op} {s * 1000:.1f}ms" for c, op, s in trace) or 'no DB calls')
+                )
+
+
+def create_metrics() -> Metrics:
+    return Metrics(
+        slow_seconds=float(os.getenv('MONGO_SLOW_MS', '100')) / 1000,
+        trace_sample=float(os.getenv('METRICS_TRACE_SAMPLE', '0')),
+    )
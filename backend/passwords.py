@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_rounds(hashed: str) -> int:
+    # "$2b$12$<salt+hash>"
+    return int(hashed.split('$')[2])
+
+
+class PasswordPool:
+    """Runs bcrypt in a dedicated thread pool with a cap on queued work.
+
+    bcrypt releases the GIL, so a few threads keep the event loop free while
+    hashing. Once ``max_pending`` operations are in flight further calls fail
+    fast with ``PasswordPoolBusy`` rather than waiting behind the queue.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordPoolBusy(f"{self.pending} password operations already in flight")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rounds': self.rounds,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_password_pool() -> PasswordPool:
+    workers = int(os.getenv('PASSWORD_WORKERS', str(min(4, os.cpu_count() or 1))))
+    return PasswordPool(
+        workers=workers,
+        max_pending=int(os.getenv('PASSWORD_MAX_PENDING', str(workers * 8))),
+    )
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 255 * 1024
+
+
+class PhotoStore(ABC):
+    """Content-addressed blob store for verification photos.
+
+    Objects are keyed by the hex SHA-256 of their bytes, so storing the same
+    upload twice keeps a single copy. ``put`` takes images already bounded by
+    the image pipeline; ``open`` streams them back in chunks.
+    """
+
+    @abstractmethod
+    async def put(self, data: bytes, content_type: str) -> dict:
+        ...
+
+    @abstractmethod
+    async def size(self, photo_id: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def open(self, photo_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield bytes ``start..end`` (inclusive) of the object."""
+
+
+class GridFSPhotoStore(PhotoStore):
+    def __init__(self, db, bucket_name: str = 'photos'):
+        self.files = db[f'{bucket_name}.files']
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=CHUNK_SIZE)
+
+    async def put(self, data, content_type):
+        grid_in = self.bucket.open_upload_stream(
+            f'pending-{uuid.uuid4()}', metadata={'content_type': content_type}
+        )
+        try:
+            await grid_in.write(data)
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        photo_id = hashlib.sha256(data).hexdigest()
+        existing = await self.files.find_one({'filename': photo_id}, {'_id': 1})
+        if existing:
+            await self.bucket.delete(grid_in._id)
+        else:
+            try:
+                # filename_unique makes this fail for the loser of a concurrent upload
+                await self.bucket.rename(grid_in._id, photo_id)
+            except DuplicateKeyError:
+                await self.bucket.delete(grid_in._id)
+
+        return {'photo_id': photo_id, 'size': len(data), 'content_type': content_type}
+
+    async def size(self, photo_id):
+        doc = await self.files.find_one({'filename': photo_id}, {'length': 1})
+        return doc['length'] if doc else None
+
+    async def open(self, photo_id, start=0, end=None):
+        grid_out = await self.bucket.open_download_stream_by_name(photo_id)
+        if end is None:
+            end = grid_out.length - 1
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class LocalPhotoStore(PhotoStore):
+    """Stores objects as ``<root>/<sha[:2]>/<sha>``; for single-host deployments."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        (self.root / 'tmp').mkdir(parents=True, exist_ok=True)
+
+    def _path(self, photo_id: str) -> Path:
+        return self.root / photo_id[:2] / photo_id
+
+    async def put(self, data, content_type):
+        tmp_path = self.root / 'tmp' / str(uuid.uuid4())
+        try:
+            await asyncio.to_thread(tmp_path.write_bytes, data)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        photo_id = hashlib.sha256(data).hexdigest()
+        path = self._path(photo_id)
+        if path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, path)
+
+        return {'photo_id': photo_id, 'size': len(data), 'content_type': content_type}
+
+    async def size(self, photo_id):
+        try:
+            return self._path(photo_id).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def open(self, photo_id, start=0, end=None):
+        f = await asyncio.to_thread(open, self._path(photo_id), 'rb')
+        try:
+            if end is None:
+                end = os.fstat(f.fileno()).st_size - 1
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+
+def create_photo_store(db, backend: str, local_dir: Path) -> PhotoStore:
+    if backend == 'local':
+        logger.info(f"Storing verification photos under {local_dir}")
+        return LocalPhotoStore(local_dir)
+    if backend == 'gridfs':
+        return GridFSPhotoStore(db)
+    raise ValueError(f"Unknown PHOTO_STORE backend: {backend}")
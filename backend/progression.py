@@ -0,0 +1,104 @@
+import bisect
+from datetime import date, timedelta
+from typing import List, Optional
+
+# Level thresholds past this no longer fit in a 64-bit Mongo integer.
+MAX_LEVEL = 90
+
+
+def calculate_xp_for_level(level: int) -> int:
+    return int(100 * (1.5 ** (level - 1)))
+
+
+# Shop boost effects consumed by quest rewards, one charge per reward
+BOOSTS = ('xp_x2', 'gold_x2')
+BOOST_MULTIPLIER = 2
+
+# LEVEL_THRESHOLDS[i] is the total XP needed to reach level i + 2
+LEVEL_THRESHOLDS: List[int] = [calculate_xp_for_level(level) for level in range(2, MAX_LEVEL + 1)]
+
+
+def level_for_xp(xp: int, current_level: int = 1) -> int:
+    """Level reached with ``xp``; levels never go down."""
+    return max(current_level, bisect.bisect_right(LEVEL_THRESHOLDS, xp) + 1)
+
+
+def next_streak(last_quest_date: Optional[str], streak: int, today: date) -> int:
+    if last_quest_date == (today - timedelta(days=1)).isoformat():
+        return streak + 1
+    if last_quest_date == today.isoformat():
+        return streak
+    return 1
+
+
+def _boost_charges(boost: str):
+    return {'$ifNull': [f'$active_boosts.{boost}', 0]}
+
+
+def _boosted(amount: int, boost: str, boosts: bool):
+    if not boosts:
+        return amount
+    return {'$cond': [{'$gt': [_boost_charges(boost), 0]}, amount * BOOST_MULTIPLIER, amount]}
+
+
+def reward_pipeline(xp: int, gold: int, today: date, boosts: bool = False) -> list:
+    """Update pipeline applying a quest reward to a user in one atomic write.
+
+    Mirrors ``level_for_xp`` and ``next_streak`` server-side, so callers that
+    fetch the pre-image (``ReturnDocument.BEFORE``) can compute the result
+    locally instead of reading the user again. With ``boosts`` each active
+    XP / gold boost doubles its part of the reward and loses one charge.
+    """
+    rewards = {
+        'xp': {'$add': [{'$ifNull': ['$xp', 0]}, _boosted(xp, 'xp_x2', boosts)]},
+        'gold': {'$add': [{'$ifNull': ['$gold', 0]}, _boosted(gold, 'gold_x2', boosts)]},
+    }
+    if boosts:
+        for boost in BOOSTS:
+            rewards[f'active_boosts.{boost}'] = {'$max': [0, {'$subtract': [_boost_charges(boost), 1]}]}
+    return [
+        {'$set': {
+            **rewards,
+            'streak': {'$switch': {
+                'branches': [
+                    {'case': {'$eq': ['$last_quest_date', (today - timedelta(days=1)).isoformat()]},
+                     'then': {'$add': [{'$ifNull': ['$streak', 0]}, 1]}},
+                    {'case': {'$eq': ['$last_quest_date', today.isoformat()]},
+                     'then': '$streak'},
+                ],
+                'default': 1,
+            }},
+            'last_quest_date': today.isoformat(),
+        }},
+        {'$set': {
+            'level': {'$max': [
+                {'$ifNull': ['$level', 1]},
+                {'$add': [1, {'$size': {'$filter': {
+                    'input': {'$literal': LEVEL_THRESHOLDS},
+                    'cond': {'$lte': ['$$this', '$xp']},
+                }}}]},
+            ]},
+        }},
+    ]
+
+
+def apply_reward(before: dict, xp: int, gold: int, today: date, boosts: bool = False) -> dict:
+    """The user fields ``reward_pipeline`` writes, computed from the pre-image."""
+    after = {}
+    if boosts:
+        charges = before.get('active_boosts') or {}
+        if charges.get('xp_x2', 0) > 0:
+            xp *= BOOST_MULTIPLIER
+        if charges.get('gold_x2', 0) > 0:
+            gold *= BOOST_MULTIPLIER
+        after['active_boosts'] = {**charges, **{boost: max(0, charges.get(boost, 0) - 1) for boost in BOOSTS}}
+
+    new_xp = before.get('xp', 0) + xp
+    after.update({
+        'xp': new_xp,
+        'gold': before.get('gold', 0) + gold,
+        'level': level_for_xp(new_xp, before.get('level', 1)),
+        'streak': next_streak(before.get('last_quest_date'), before.get('streak', 0), today),
+        'last_quest_date': today.isoformat(),
+    })
+    return after
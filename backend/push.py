@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One WebSocket's outbox. ``None`` in the queue means: disconnect, too slow."""
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def next(self) -> Optional[str]:
+        return await self.queue.get()
+
+
+class PushHub:
+    """Fans messages out to connected WebSockets through bounded queues.
+
+    Publishing never awaits a socket: a message is encoded once and
+    ``put_nowait`` into each subscriber's queue. A subscriber whose queue is
+    full is dropped rather than letting it buffer without bound; its client
+    reconnects and refetches over HTTP.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.sent = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def connected(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def connected_users(self) -> Set[str]:
+        return set(self._subscribers)
+
+    def _deliver(self, subscribers: Iterable[Subscriber], message: str):
+        for subscriber in list(subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+                self.sent += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self.dropped += 1
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def publish(self, user_ids: Iterable[str], message: dict):
+        targets = [s for user_id in user_ids for s in self._subscribers.get(user_id, ())]
+        if targets:
+            self._deliver(targets, orjson.dumps(message).decode())
+
+    def broadcast(self, message: dict):
+        if self._subscribers:
+            self._deliver([s for subs in self._subscribers.values() for s in subs], orjson.dumps(message).decode())
+
+    def spawn(self, coro):
+        # Fan-out that needs a query runs after the response; keep a reference until done.
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Push fan-out failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self._subscribers),
+            'connections': sum(len(subs) for subs in self._subscribers.values()),
+            'queue_size': self.queue_size,
+            'sent': self.sent,
+            'dropped': self.dropped,
+        }
+
+
+def create_push_hub() -> PushHub:
+    return PushHub(queue_size=int(os.getenv('PUSH_QUEUE_SIZE', '64')))
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+from progression import MAX_LEVEL, calculate_xp_for_level
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('productivity', 'fitness', 'study', 'health', 'habits')
+LEVEL_BAND_SIZE = 5
+LEVEL_BANDS = (MAX_LEVEL - 1) // LEVEL_BAND_SIZE + 1
+DIFFICULTY_SCALE = {'easy': 0.5, 'medium': 1.0, 'hard': 2.0}
+
+TEMPLATES = {
+    'productivity': [
+        ('easy', 'Inbox Sweep', 'Clear or file every message in one inbox.'),
+        ('medium', 'Productivity Challenge', 'Complete one meaningful productivity task today.'),
+        ('hard', 'Deep Work Block', 'Work for two hours on your most important task without distractions.'),
+    ],
+    'fitness': [
+        ('easy', 'Stretch Break', 'Do ten minutes of stretching.'),
+        ('medium', 'Fitness Challenge', 'Complete a 30 minute workout.'),
+        ('hard', 'Endurance Trial', 'Run, cycle or swim for an hour.'),
+    ],
+    'study': [
+        ('easy', 'Flashcard Review', 'Review one deck of flashcards.'),
+        ('medium', 'Study Challenge', 'Study one chapter and write a short summary.'),
+        ('hard', 'Exam Rehearsal', 'Solve a full practice exam under timed conditions.'),
+    ],
+    'health': [
+        ('easy', 'Hydration Check', 'Drink eight glasses of water today.'),
+        ('medium', 'Health Challenge', 'Cook a balanced meal from scratch.'),
+        ('hard', 'Reset Day', 'Go a full day without sugar, alcohol or screens after 9pm.'),
+    ],
+    'habits': [
+        ('easy', 'Make the Bed', 'Start the day by making your bed.'),
+        ('medium', 'Habits Challenge', 'Keep one good habit going all day.'),
+        ('hard', 'Habit Stack', 'Complete your full morning routine before 8am.'),
+    ],
+}
+
+
+def level_band(level: int) -> int:
+    return min(max(level, 1) - 1, MAX_LEVEL - 1) // LEVEL_BAND_SIZE
+
+
+def band_rewards(band: int, difficulty: str) -> Tuple[int, int]:
+    """XP and gold for a quest in ``band``; a medium quest at level 1 gives 100 XP."""
+    xp = int(calculate_xp_for_level(band * LEVEL_BAND_SIZE + 1) * DIFFICULTY_SCALE[difficulty])
+    return xp, xp // 4
+
+
+class TemplateGenerator:
+    """Local quest generator; cheap enough to also serve as the empty-pool fallback."""
+
+    def make(self, category: str, band: int) -> dict:
+        difficulty, title, description = random.choice(TEMPLATES.get(category) or [(
+            'medium', f"{category.title()} Challenge", f"Complete one meaningful {category} task today."
+        )])
+        xp, gold = band_rewards(band, difficulty)
+        return {
+            'title': title,
+            'description': description,
+            'quest_type': 'daily',
+            'difficulty': difficulty,
+            'xp_reward': xp,
+            'gold_reward': gold,
+            'category': category,
+        }
+
+    async def generate(self, category: str, band: int, count: int) -> List[dict]:
+        return [self.make(category, band) for _ in range(count)]
+
+
+class QuestPool:
+    """Ready-made quests per ``(category, level band)``, refilled in the background.
+
+    ``take`` is a deque pop and never waits on ``generator``; an empty pool
+    is served from ``fallback`` and counted. ``generator`` is any object with
+    an async ``generate(category, band, count)``, so a slow remote generator
+    can replace the templates without touching the request path.
+    """
+
+    def __init__(self, generator, fallback: TemplateGenerator, depth: int, low_water: int,
+                 refill_interval: float = 1.0, rate_window: float = 60.0):
+        self.generator = generator
+        self.fallback = fallback
+        self.depth = depth
+        self.low_water = low_water
+        self.refill_interval = refill_interval
+        self.rate_window = rate_window
+        self.taken = 0
+        self.fallbacks = 0
+        self.refilled = 0
+        self.refill_errors = 0
+        self._pools: Dict[Tuple[str, int], deque] = {
+            (category, band): deque() for category in CATEGORIES for band in range(LEVEL_BANDS)
+        }
+        self._refills: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def take(self, category: str, level: int) -> dict:
+        band = level_band(level)
+        pool = self._pools.get((category, band))
+        if pool is None:
+            return self.fallback.make(category, band)
+
+        self.taken += 1
+        if len(pool) <= self.low_water:
+            self._wakeup.set()
+        if not pool:
+            self.fallbacks += 1
+            return self.fallback.make(category, band)
+        return pool.popleft()
+
+    async def refill(self):
+        for (category, band), pool in self._pools.items():
+            if len(pool) > self.low_water:
+                continue
+            count = self.depth - len(pool)
+            try:
+                quests = await self.generator.generate(category, band, count)
+            except Exception as e:
+                self.refill_errors += 1
+                logger.error(f"Quest generator failed for {category}/{band}: {e}")
+                continue
+            pool.extend(quests)
+            self.refilled += len(quests)
+            self._refills.append((time.monotonic(), len(quests)))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.refill()
+
+    async def start(self):
+        start = time.perf_counter()
+        await self.refill()
+        logger.info(f"Quest pool filled with {self.refilled} quests in {time.perf_counter() - start:.2f}s")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        cutoff = time.monotonic() - self.rate_window
+        while self._refills and self._refills[0][0] < cutoff:
+            self._refills.popleft()
+        depths = [len(pool) for pool in self._pools.values()]
+        return {
+            'pools': len(depths),
+            'depth': sum(depths),
+            'min_depth': min(depths),
+            'target_depth': self.depth,
+            'taken': self.taken,
+            'fallbacks': self.fallbacks,
+            'refilled': self.refilled,
+            'refill_errors': self.refill_errors,
+            'refill_rate': sum(count for _, count in self._refills) / self.rate_window,
+        }
+
+
+def create_quest_pool() -> QuestPool:
+    templates = TemplateGenerator()
+    return QuestPool(
+        generator=templates,
+        fallback=templates,
+        depth=int(os.getenv('QUEST_POOL_DEPTH', '32')),
+        low_water=int(os.getenv('QUEST_POOL_LOW_WATER', '8')),
+    )
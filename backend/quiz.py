@@ -0,0 +1,88 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+DEFAULT_TEMPLATE_ID = 'self_check_v1'
+
+# Templates are immutable once shipped: quests keep only the id and a copy
+# of the answer key, so a changed question needs a new id.
+QUIZ_TEMPLATES: Dict[str, dict] = {
+    'self_check_v1': {
+        'questions': [
+            {
+                "question": "Did you complete the task honestly?",
+                "options": ["Yes", "No", "Partially", "Skipped"],
+            },
+            {
+                "question": "Did you understand what you worked on?",
+                "options": ["Yes", "Somewhat", "No", "Not sure"],
+            },
+            {
+                "question": "Would you repeat this task tomorrow?",
+                "options": ["Yes", "Maybe", "No", "Not sure"],
+            },
+        ],
+        'answer_key': [0, 0, 0],
+        'pass_score': 2,
+    },
+}
+
+
+class QuizError(ValueError):
+    pass
+
+
+def get_template(template_id: str) -> Optional[dict]:
+    return QUIZ_TEMPLATES.get(template_id)
+
+
+def notes_id(notes: str) -> str:
+    return hashlib.sha256(notes.encode('utf-8')).hexdigest()
+
+
+async def store_notes(db, note_id: str, notes: str):
+    """Store a notes body once per distinct content, keyed by ``notes_id``."""
+    try:
+        await db.quiz_notes.update_one(
+            {'_id': note_id},
+            {'$setOnInsert': {
+                'notes': notes,
+                'size': len(notes),
+                'created_at': datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert of the same notes won the race.
+        pass
+
+
+def quiz_reference(template_id: str, note_id: str) -> dict:
+    # The answer key is a few ints, so grading never has to load the template.
+    template = QUIZ_TEMPLATES[template_id]
+    return {
+        'quiz_template_id': template_id,
+        'notes_id': note_id,
+        'answer_key': template['answer_key'],
+        'pass_score': template['pass_score'],
+        'passed': False,
+    }
+
+
+def grade(verification_data: dict, answers: List[str]) -> dict:
+    answer_key = verification_data.get('answer_key')
+    pass_score = verification_data.get('pass_score')
+    if answer_key is None:
+        # Quests from before templates carried the full questions inline.
+        questions = verification_data.get('questions') or []
+        answer_key = [q['correct_answer'] for q in questions]
+        pass_score = 2
+    if len(answers) != len(answer_key):
+        raise QuizError(f"Expected {len(answer_key)} answers, got {len(answers)}")
+    try:
+        score = sum(1 for answer, correct in zip(answers, answer_key) if int(answer) == correct)
+    except ValueError:
+        raise QuizError("Answers must be option indexes") from None
+    return {'passed': score >= pass_score, 'score': score, 'total': len(answer_key)}
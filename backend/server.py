@@ -1,36 +1,124 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Header
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Header, Query, Body, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 import os
 import logging
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
 #from emergentintegrations.llm.chat import LlmChat, UserMessage
+import asyncio
 import base64
-from PIL import Image
-import io
+from contextlib import asynccontextmanager
+import json
+import orjson
+from indexes import ensure_indexes
+from photo_store import CHUNK_SIZE, create_photo_store
+from imaging import ImagePoolBusy, InvalidImage, create_image_pipeline
+from passwords import PasswordPoolBusy, create_password_pool
+from user_cache import create_user_cache
+from leaderboard import PROJECTION as LEADERBOARD_PROJECTION, Leaderboard
+from progression import apply_reward, calculate_xp_for_level, reward_pipeline
+from quest_pool import create_quest_pool
+from streaks import create_streak_job
+from events import create_event_processor, quest_completed_event
+from consumers import BadgeAwarder, LeaderboardConsumer, RollupConsumer
+from push import create_push_hub
+from quiz import DEFAULT_TEMPLATE_ID, QuizError, get_template, grade, notes_id, quiz_reference, store_notes
+from etag import Versions, etag_matches, not_modified, static_etag, with_etag
+from metrics import MetricsMiddleware, create_metrics
+from singleflight import create_single_flight
+from cache_backend import create_cache_backend
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+metrics = create_metrics()
+
+# Connection pool settings; the client connects lazily, startup opens MONGO_MIN_POOL_SIZE up front
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_IDLE_MS = int(os.getenv('MONGO_MAX_IDLE_MS', '300000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000'))
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    event_listeners=[metrics.command_listener],
+)
 db = client[os.environ['DB_NAME']]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 JWT_SECRET = os.getenv('JWT_SECRET', 'life-rpg-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 720
 
+# Quest completion, its reward and its outbox event commit in one multi-document
+# transaction, which needs a replica set or mongos; startup fails without one.
+# Turning it off is for standalone development servers only.
+QUEST_TRANSACTIONS = os.getenv('QUEST_TRANSACTIONS', 'true').lower() in ('1', 'true', 'yes')
+QUEST_BULK_LIMIT = int(os.getenv('QUEST_BULK_LIMIT', '500'))
+QUEST_PAGE_MAX = 200
+FRIENDS_MAX = 5000
+
+PHOTO_MAX_BYTES = int(os.getenv('PHOTO_MAX_BYTES', str(10 * 1024 * 1024)))
+# Uploads are decoded whole, so at most PHOTO_BUFFERS * PHOTO_MAX_BYTES of them sit in memory
+PHOTO_BUFFERS = int(os.getenv('PHOTO_BUFFERS', '8'))
+photo_buffers = asyncio.Semaphore(PHOTO_BUFFERS)
+QUIZ_NOTES_MAX = int(os.getenv('QUIZ_NOTES_MAX', str(64 * 1024)))
+photo_store = create_photo_store(
+    db,
+    os.getenv('PHOTO_STORE', 'gridfs'),
+    Path(os.getenv('PHOTO_STORE_DIR', str(ROOT_DIR / 'photos'))),
+)
+image_pipeline = create_image_pipeline()
+password_pool = create_password_pool()
+cache_backend = create_cache_backend()
+user_cache = create_user_cache(cache_backend)
+leaderboard = Leaderboard()
+versions = Versions()
+quest_pool = create_quest_pool()
+push_hub = create_push_hub()
+flights = create_single_flight()
+
+# Seconds a serialized leaderboard page is reused; pages are keyed by version, so never stale
+LEADERBOARD_PAGE_TTL = float(os.getenv('LEADERBOARD_PAGE_TTL', '5'))
+
+# Leaderboard changes are broadcast only when they touch this many top ranks
+PUSH_LEADERBOARD_TOP = int(os.getenv('PUSH_LEADERBOARD_TOP', '50'))
+# Seconds a new push socket has to send its auth message
+PUSH_AUTH_TIMEOUT = float(os.getenv('PUSH_AUTH_TIMEOUT', '5'))
+
+# user-scoped responses may be cached by the browser but must be revalidated
+PRIVATE_CACHE = 'private, no-cache'
+PUBLIC_CACHE = 'public, no-cache'
+
 # Pydantic Models
 class UserRegister(BaseModel):
     email: EmailStr
@@ -94,6 +182,11 @@ class VerificationSubmit(BaseModel):
     verification_type: str
     notes: Optional[str] = None
 
+class QuizGenerate(BaseModel):
+    quest_id: str
+    notes: str = Field(min_length=1, max_length=QUIZ_NOTES_MAX)
+    template_id: str = DEFAULT_TEMPLATE_ID
+
 class QuizAnswer(BaseModel):
     quest_id: str
     answers: List[str]
@@ -121,15 +214,27 @@ class ShopItem(BaseModel):
     item_type: str
     effect: str
 
+class Purchase(BaseModel):
+    item_id: str
+    quantity: int = Field(1, ge=1, le=99)
+
+class UseItem(BaseModel):
+    item_id: str
+
 class FriendRequest(BaseModel):
     friend_username: str
 
+class BulkComplete(BaseModel):
+    quest_ids: List[str]
+
 # Helper Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def json_response(content, status_code: int = 200) -> ORJSONResponse:
+    """Serialize plain dicts/lists (Mongo documents, model dumps) straight with orjson.
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    Returning a Response skips FastAPI's jsonable_encoder walk, which would
+    otherwise re-visit every value of data that is already JSON-safe.
+    """
+    return ORJSONResponse(content, status_code=status_code)
 
 def create_token(user_id: str) -> str:
     exp = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -141,23 +246,84 @@ def decode_token(token: str) -> dict:
     except:
         return None
 
-def calculate_xp_for_level(level: int) -> int:
-    return int(100 * (1.5 ** (level - 1)))
+# Projection for routes that only need to know who is calling
+USER_ID_ONLY = ('id',)
 
-async def get_current_user(token: str) -> dict:
+def get_token_user_id(token: str) -> str:
+    """The user id a bearer token belongs to, without touching Mongo."""
     if not token or not token.startswith('Bearer '):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    decoded = decode_token(token.split(' ')[1])
+    raw_token = token.split(' ')[1]
+    decoded = user_cache.get_token(raw_token)
     if not decoded:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+        decoded = decode_token(raw_token)
+        if not decoded:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        user_cache.set_token(raw_token, decoded)
     
-    user = await db.users.find_one({'id': decoded['user_id']}, {'_id': 0, 'password_hash': 0})
+    return decoded['user_id']
+
+async def get_current_user(token: str, fields: Optional[tuple] = None) -> dict:
+    """Resolve the bearer token to a user document.
+
+    ``fields`` picks the keys returned. A miss always reads and caches the
+    whole document, so the next call on any route is served from the cache.
+    """
+    user_id = get_token_user_id(token)
+    
+    user = await user_cache.load_user(user_id)
+    if user is None:
+        user = await _load_user(user_id)
+    return {f: user[f] for f in fields if f in user} if fields else dict(user)
+
+async def _load_user(user_id: str) -> dict:
+    # Every write to the user bumps this; a read that raced one is returned but not cached.
+    version = versions.etag(f"user:{user_id}")
+    user = await db.users.find_one({'id': user_id}, {'_id': 0, 'password_hash': 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+    if versions.etag(f"user:{user_id}") == version:
+        await user_cache.store_user(user)
     return user
 
+# Cross-worker invalidation
+# Messages are b'u <user ids>' (user changed) or b'l <user ids>' (their leaderboard entry changed too)
+USER_IDS_PER_MESSAGE = 20
+_reload_tasks = set()
+
+async def _share_user_changes(user_ids: List[str], leaderboard_entry: bool = False):
+    """Tell the other workers these users changed; call after updating this worker's caches."""
+    await asyncio.gather(*(user_cache.share_change(user_id) for user_id in user_ids))
+    kind = b'l ' if leaderboard_entry else b'u '
+    for i in range(0, len(user_ids), USER_IDS_PER_MESSAGE):
+        await cache_backend.publish(kind + ' '.join(user_ids[i:i + USER_IDS_PER_MESSAGE]).encode())
+
+async def _reload_leaderboard_entries(user_ids: List[str]):
+    async for doc in db.users.find({'id': {'$in': user_ids}}, LEADERBOARD_PROJECTION):
+        fields = {'username': doc.get('username'), 'xp': doc.get('xp', 0), 'level': doc.get('level', 1)}
+        if doc.get('avatar'):
+            fields['avatar_image'] = doc['avatar'].get('avatar_image')
+        leaderboard.upsert(doc['id'], **fields)
+    versions.bump('leaderboard')
+
+def _on_cache_message(message: Optional[bytes]):
+    if message is None:
+        # Messages were missed, so anything cached here may be stale.
+        user_cache.clear_users()
+        versions.rotate()
+        return
+    
+    kind, _, body = message.partition(b' ')
+    user_ids = body.decode().split()
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
+        versions.bump(f"user:{user_id}")
+    if kind == b'l':
+        task = asyncio.create_task(_reload_leaderboard_entries(user_ids))
+        _reload_tasks.add(task)
+        task.add_done_callback(_reload_tasks.discard)
+
 # Auth Routes
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
@@ -169,7 +335,10 @@ async def register(user_data: UserRegister):
     if existing_username:
         raise HTTPException(status_code=400, detail="Username already taken")
     
-    password_hash = hash_password(user_data.password)
+    try:
+        password_hash = await password_pool.hash(user_data.password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={'Retry-After': '1'})
     
     user = User(
         email=user_data.email,
@@ -179,7 +348,16 @@ async def register(user_data: UserRegister):
     user_dict = user.model_dump()
     user_dict['password_hash'] = password_hash
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError as e:
+        # A concurrent registration took the email or username after the checks above
+        if 'email' in (e.details or {}).get('keyPattern', {}):
+            raise HTTPException(status_code=400, detail="Email already registered")
+        raise HTTPException(status_code=400, detail="Username already taken")
+    leaderboard.upsert(user.id, username=user.username)
+    versions.bump('leaderboard')
+    await _share_user_changes([user.id], leaderboard_entry=True)
     
     token = create_token(user.id)
     
@@ -188,9 +366,29 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user_doc = await db.users.find_one({'email': credentials.email})
-    if not user_doc or not verify_password(credentials.password, user_doc['password_hash']):
+    if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    try:
+        valid = await password_pool.verify(credentials.password, user_doc['password_hash'])
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={'Retry-After': '1'})
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    if password_pool.needs_rehash(user_doc['password_hash']):
+        # BCRYPT_ROUNDS changed since this hash was made; upgrade it now that we know the password.
+        try:
+            new_hash = await password_pool.hash(credentials.password)
+        except PasswordPoolBusy:
+            new_hash = None
+        if new_hash:
+            await db.users.update_one(
+                {'id': user_doc['id'], 'password_hash': user_doc['password_hash']},
+                {'$set': {'password_hash': new_hash}}
+            )
+            password_pool.rehashed += 1
+    
     token = create_token(user_doc['id'])
     
     user_doc.pop('_id', None)
@@ -200,28 +398,50 @@ async def login(credentials: UserLogin):
 
 # User Routes
 @api_router.get("/user/profile")
-async def get_profile(authorization: str = Header(None)):
+async def get_profile(authorization: str = Header(None), if_none_match: Optional[str] = Header(None)):
+    etag = versions.etag(f"user:{get_token_user_id(authorization or '')}")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PRIVATE_CACHE)
+    
     user = await get_current_user(authorization or "")
-    return user
+    return with_etag(json_response(user), etag, PRIVATE_CACHE)
 
 @api_router.put("/user/avatar")
 async def update_avatar(avatar_data: Avatar, authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
     
+    avatar = avatar_data.model_dump()
     await db.users.update_one(
         {'id': user['id']},
-        {'$set': {'avatar': avatar_data.model_dump()}}
+        {'$set': {'avatar': avatar}}
     )
+    user_cache.update(user['id'], {'avatar': avatar})
+    leaderboard.upsert(user['id'], avatar_image=avatar['avatar_image'])
+    versions.bump(f"user:{user['id']}")
+    versions.bump('leaderboard')
+    await _share_user_changes([user['id']], leaderboard_entry=True)
+    
+    rank = leaderboard.rank(user['id'])
+    _push_leaderboard(user['id'], rank, rank)
+    _push_to_friends(user['id'], 'friend_avatar')
     
     return {'message': 'Avatar updated successfully'}
 
-@api_router.get("/user/stats")
-async def get_stats(authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
-    
-    completed_quests = await db.quests.count_documents({'user_id': user['id'], 'status': 'completed'})
-    active_quests = await db.quests.count_documents({'user_id': user['id'], 'status': 'active'})
-    
+@flights.coalesce()
+async def _quest_counts(user_id: str, etag: str) -> dict:
+    """Quest counts per status from a single $group.
+
+    ``etag`` is the user's version taken before the read; it is part of the
+    single-flight key, so a request made after a write never joins a flight
+    that started before it.
+    """
+    counts = await db.quests.aggregate([
+        {'$match': {'user_id': user_id}},
+        {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+    ]).to_list(None)
+    return {c['_id']: c['count'] for c in counts}
+
+def _build_stats(user: dict, counts: dict) -> dict:
     return {
         'level': user['level'],
         'xp': user['xp'],
@@ -230,15 +450,28 @@ async def get_stats(authorization: str = Header(None)):
         'max_hp': user['max_hp'],
         'streak': user['streak'],
         'badges': user.get('badges', []),
-        'completed_quests': completed_quests,
-        'active_quests': active_quests,
+        'completed_quests': counts.get('completed', 0),
+        'active_quests': counts.get('active', 0),
         'xp_to_next_level': calculate_xp_for_level(user['level'] + 1) - user['xp']
     }
 
+@api_router.get("/user/stats")
+async def get_stats(authorization: str = Header(None), if_none_match: Optional[str] = Header(None)):
+    user_id = get_token_user_id(authorization or "")
+    etag = versions.etag(f"user:{user_id}")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PRIVATE_CACHE)
+    
+    user, counts = await asyncio.gather(
+        get_current_user(authorization or ""),
+        _quest_counts(user_id, etag)
+    )
+    return with_etag(json_response(_build_stats(user, counts)), etag, PRIVATE_CACHE)
+
 # Quest Routes
 @api_router.post("/quests/create")
 async def create_quest(quest_data: QuestCreate, authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
     
     quest = Quest(
         user_id=user['id'],
@@ -247,111 +480,371 @@ async def create_quest(quest_data: QuestCreate, authorization: str = Header(None
     
     quest_dict = quest.model_dump()
     await db.quests.insert_one(quest_dict)
+    quest_dict.pop('_id', None)
+    versions.bump(f"user:{user['id']}")
+    await _share_user_changes([user['id']])
     
-    return quest
+    return json_response(quest_dict)
 
-@api_router.get("/quests/active")
-async def get_active_quests(authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+@api_router.post("/quests/bulk")
+async def create_quests_bulk(quests: List[dict] = Body(...), authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
     
-    quests = await db.quests.find(
-        {'user_id': user['id'], 'status': 'active'},
-        {'_id': 0}
-    ).to_list(100)
+    if len(quests) > QUEST_BULK_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {QUEST_BULK_LIMIT} quests per request")
     
-    return quests
-
-@api_router.get("/quests/completed")
-async def get_completed_quests(authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+    results = []
+    docs = []
+    doc_index = []
+    for index, payload in enumerate(quests):
+        try:
+            quest_data = QuestCreate.model_validate(payload)
+        except ValidationError as e:
+            results.append({'index': index, 'status': 'invalid', 'errors': e.errors(include_url=False, include_context=False)})
+            continue
+        quest = Quest(user_id=user['id'], **quest_data.model_dump())
+        results.append({'index': index, 'status': 'created', 'id': quest.id})
+        docs.append(quest.model_dump())
+        doc_index.append(index)
     
-    quests = await db.quests.find(
-        {'user_id': user['id'], 'status': 'completed'},
-        {'_id': 0}
-    ).sort('completed_at', -1).to_list(50)
+    if docs:
+        try:
+            await db.quests.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                result = results[doc_index[error['index']]]
+                result['status'] = 'failed'
+                result['errors'] = [error.get('errmsg')]
+                result.pop('id', None)
+        versions.bump(f"user:{user['id']}")
+        await _share_user_changes([user['id']])
     
-    return quests
+    return {
+        'created': sum(1 for r in results if r['status'] == 'created'),
+        'results': results
+    }
 
-@api_router.post("/quests/{quest_id}/complete")
-async def complete_quest(quest_id: str, authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
-    
-    quest = await db.quests.find_one({'id': quest_id, 'user_id': user['id']}, {'_id': 0})
-    if not quest:
-        raise HTTPException(status_code=404, detail="Quest not found")
+QUEST_FIELDS = frozenset(Quest.model_fields)
+# Verification payloads are only sent when asked for by name
+DEFAULT_QUEST_FIELDS = QUEST_FIELDS - {'verification_data'}
+
+def _quest_projection(fields: Optional[str]) -> dict:
+    if fields:
+        names = {f.strip() for f in fields.split(',') if f.strip()}
+        unknown = names - QUEST_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown quest fields: {', '.join(sorted(unknown))}")
+    else:
+        names = DEFAULT_QUEST_FIELDS
+    return {'_id': 0, 'id': 1, **{name: 1 for name in names}}
+
+def _encode_cursor(sort_value, quest_id: str) -> str:
+    raw = json.dumps([sort_value, quest_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        sort_value, quest_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return sort_value, str(quest_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _quest_page(user_id: str, status: str, sort_field: str, direction: int,
+                      limit: int, cursor: Optional[str], fields: Optional[str]) -> dict:
+    """One keyset page of a user's quests ordered by (sort_field, id)."""
+    query = {'user_id': user_id, 'status': status}
+    if cursor:
+        sort_value, quest_id = _decode_cursor(cursor)
+        op = '$gt' if direction == 1 else '$lt'
+        query['$or'] = [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, 'id': {op: quest_id}}
+        ]
     
-    if quest['status'] != 'active':
-        raise HTTPException(status_code=400, detail="Quest already completed")
+    projection = _quest_projection(fields)
+    keep_sort_field = sort_field in projection
+    projection[sort_field] = 1
     
-    if quest.get('verification_required') and not quest.get('verification_data'):
-        raise HTTPException(status_code=400, detail="Verification required")
+    quests = await db.quests.find(query, projection).sort(
+        [(sort_field, direction), ('id', direction)]
+    ).limit(limit + 1).to_list(limit + 1)
     
-    new_xp = user['xp'] + quest['xp_reward']
-    new_gold = user['gold'] + quest['gold_reward']
-    new_level = user['level']
-    
-    xp_needed = calculate_xp_for_level(new_level + 1)
-    while new_xp >= xp_needed:
-        new_level += 1
-        xp_needed = calculate_xp_for_level(new_level + 1)
-    
-    today = datetime.now(timezone.utc).date().isoformat()
-    new_streak = user['streak']
-    if user.get('last_quest_date'):
-        last_date = datetime.fromisoformat(user['last_quest_date']).date()
-        if (datetime.now(timezone.utc).date() - last_date).days == 1:
-            new_streak += 1
-        elif (datetime.now(timezone.utc).date() - last_date).days > 1:
-            new_streak = 1
-    else:
-        new_streak = 1
+    next_cursor = None
+    if len(quests) > limit:
+        quests = quests[:limit]
+        next_cursor = _encode_cursor(quests[-1][sort_field], quests[-1]['id'])
+    if not keep_sort_field:
+        for quest in quests:
+            quest.pop(sort_field, None)
     
-    await db.users.update_one(
-        {'id': user['id']},
-        {'$set': {
-            'xp': new_xp,
-            'gold': new_gold,
-            'level': new_level,
-            'streak': new_streak,
-            'last_quest_date': today
-        }}
+    return {'items': quests, 'next_cursor': next_cursor}
+
+@api_router.get("/quests/active")
+async def get_active_quests(
+    limit: int = Query(100, ge=1, le=QUEST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    authorization: str = Header(None)
+):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    return json_response(await _quest_page(user['id'], 'active', 'created_at', 1, limit, cursor, fields))
+
+@api_router.get("/quests/completed")
+async def get_completed_quests(
+    limit: int = Query(50, ge=1, le=QUEST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    authorization: str = Header(None)
+):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    return json_response(await _quest_page(user['id'], 'completed', 'completed_at', -1, limit, cursor, fields))
+
+DASHBOARD_QUESTS = 5
+DASHBOARD_QUEST_FIELDS = 'title,description,difficulty,category,xp_reward,gold_reward,quest_type,created_at'
+
+@api_router.get("/dashboard")
+async def get_dashboard(authorization: str = Header(None)):
+    user_id = get_token_user_id(authorization or "")
+    user, counts, active = await asyncio.gather(
+        get_current_user(authorization or ""),
+        _quest_counts(user_id, versions.etag(f"user:{user_id}")),
+        _quest_page(user_id, 'active', 'created_at', 1, DASHBOARD_QUESTS, None, DASHBOARD_QUEST_FIELDS)
     )
+    return json_response({
+        'profile': user,
+        'stats': _build_stats(user, counts),
+        'active_quests': active['items'],
+        'next_cursor': active['next_cursor'],
+        'rank': leaderboard.rank(user_id)
+    })
+
+# Fields a user document needs for apply_reward
+REWARD_FIELDS = {'_id': 0, 'xp': 1, 'gold': 1, 'level': 1, 'streak': 1, 'last_quest_date': 1, 'active_boosts': 1}
+
+async def _grant_reward(user_id: str, xp: int, gold: int, session=None, boosts: bool = False) -> tuple:
+    """Apply a reward in one atomic update; returns (before, after) user fields."""
+    today = datetime.now(timezone.utc).date()
+    before = await db.users.find_one_and_update(
+        {'id': user_id},
+        reward_pipeline(xp, gold, today, boosts=boosts),
+        projection=REWARD_FIELDS,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if not before:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    await db.quests.update_one(
-        {'id': quest_id},
+    return before, apply_reward(before, xp, gold, today, boosts=boosts)
+
+# Push notifications
+def _push_leaderboard(user_id: str, rank: Optional[int], previous_rank: Optional[int]):
+    if rank is None:
+        return
+    if rank <= PUSH_LEADERBOARD_TOP or (previous_rank or rank) <= PUSH_LEADERBOARD_TOP:
+        push_hub.broadcast({
+            'type': 'leaderboard',
+            'rank': rank,
+            'previous_rank': previous_rank,
+            **leaderboard.entry(user_id)
+        })
+
+async def _push_followers(user_id: str, message: dict):
+    # Only the followers that are connected to this worker are looked up.
+    online = push_hub.connected_users()
+    followers = await db.friends.find(
+        {'friend_id': user_id, 'user_id': {'$in': list(online)}},
+        {'_id': 0, 'user_id': 1}
+    ).to_list(len(online))
+    push_hub.publish([f['user_id'] for f in followers], message)
+
+def _push_to_friends(user_id: str, message_type: str):
+    if not push_hub.connected_users():
+        return
+    entry = leaderboard.entry(user_id) or {}
+    push_hub.spawn(_push_followers(user_id, {'type': message_type, 'user_id': user_id, **entry}))
+
+def _publish_progress(user_id: str, after: dict):
+    # Call only once the write is committed.
+    previous_rank = leaderboard.rank(user_id)
+    user_cache.update(user_id, after)
+    leaderboard.upsert(user_id, xp=after['xp'], level=after['level'])
+    versions.bump(f"user:{user_id}")
+    versions.bump('leaderboard')
+    
+    rank = leaderboard.rank(user_id)
+    push_hub.publish([user_id], {
+        'type': 'progress',
+        'xp': after['xp'],
+        'gold': after['gold'],
+        'level': after['level'],
+        'streak': after['streak'],
+        'xp_to_next_level': calculate_xp_for_level(after['level'] + 1) - after['xp'],
+        'rank': rank,
+        'previous_rank': previous_rank
+    })
+    _push_leaderboard(user_id, rank, previous_rank)
+    _push_to_friends(user_id, 'friend_progress')
+
+def _completable_filter(user_id: str, quest_id: str) -> dict:
+    # The status guard makes the active -> completed transition happen at most once.
+    return {
+        'id': quest_id,
+        'user_id': user_id,
+        'status': 'active',
+        '$or': [
+            {'verification_required': {'$ne': True}},
+            {'verification_data': {'$nin': [None, {}]}}
+        ]
+    }
+
+async def _complete_quest(user_id: str, quest_id: str, session=None) -> tuple:
+    quest = await db.quests.find_one_and_update(
+        _completable_filter(user_id, quest_id),
         {'$set': {
             'status': 'completed',
             'completed_at': datetime.now(timezone.utc).isoformat()
-        }}
+        }},
+        projection={'_id': 0, 'id': 1, 'category': 1, 'xp_reward': 1, 'gold_reward': 1},
+        session=session
     )
+    if not quest:
+        existing = await db.quests.find_one({'id': quest_id, 'user_id': user_id}, {'_id': 0, 'status': 1}, session=session)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Quest not found")
+        if existing['status'] != 'active':
+            raise HTTPException(status_code=400, detail="Quest already completed")
+        raise HTTPException(status_code=400, detail="Verification required")
+    
+    before, after = await _grant_reward(user_id, quest['xp_reward'], quest['gold_reward'], session=session, boosts=True)
+    xp_gained = after['xp'] - before.get('xp', 0)
+    gold_gained = after['gold'] - before.get('gold', 0)
+    
+    # Outbox for badges and rollups; commits or rolls back with the quest and reward.
+    await db.events.insert_one(quest_completed_event(user_id, quest, xp_gained, gold_gained, after), session=session)
     
     return {
-        'xp_gained': quest['xp_reward'],
-        'gold_gained': quest['gold_reward'],
-        'new_level': new_level,
-        'level_up': new_level > user['level'],
-        'new_streak': new_streak
-    }
+        'xp_gained': xp_gained,
+        'gold_gained': gold_gained,
+        'new_level': after['level'],
+        'level_up': after['level'] > before.get('level', 1),
+        'new_streak': after['streak']
+    }, after
+
+async def _in_quest_transaction(fn, *args):
+    # with_transaction reruns fn on TransientTransactionError, which is what a
+    # concurrent completion for the same user gets (WriteConflict), and retries
+    # the commit on UnknownTransactionCommitResult; other errors abort it.
+    if not QUEST_TRANSACTIONS:
+        return await fn(*args)
+    async with await client.start_session() as session:
+        return await session.with_transaction(lambda s: fn(*args, session=s))
+
+@api_router.post("/quests/{quest_id}/complete")
+async def complete_quest(quest_id: str, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    result, after = await _in_quest_transaction(_complete_quest, user['id'], quest_id)
+    
+    _publish_progress(user['id'], after)
+    await _share_user_changes([user['id']])
+    return result
+
+async def _complete_quests_bulk(user_id: str, quest_ids: List[str], session=None) -> tuple:
+    batch_id = str(uuid.uuid4())
+    completed_at = datetime.now(timezone.utc).isoformat()
+    await db.quests.bulk_write(
+        [
+            UpdateOne(
+                _completable_filter(user_id, quest_id),
+                {'$set': {'status': 'completed', 'completed_at': completed_at, 'completion_batch': batch_id}}
+            )
+            for quest_id in quest_ids
+        ],
+        ordered=False,
+        session=session
+    )
+    
+    # The batch marker tells which quests this request moved, even under races.
+    quests = await db.quests.find(
+        {'id': {'$in': quest_ids}, 'user_id': user_id},
+        {'_id': 0, 'id': 1, 'status': 1, 'completion_batch': 1, 'category': 1, 'xp_reward': 1, 'gold_reward': 1},
+        session=session
+    ).to_list(len(quest_ids))
+    by_id = {q['id']: q for q in quests}
+    
+    results = []
+    moved = []
+    total_xp = total_gold = 0
+    for quest_id in quest_ids:
+        quest = by_id.get(quest_id)
+        if not quest:
+            results.append({'quest_id': quest_id, 'status': 'not_found'})
+        elif quest.get('completion_batch') == batch_id:
+            moved.append(quest)
+            total_xp += quest['xp_reward']
+            total_gold += quest['gold_reward']
+            results.append({
+                'quest_id': quest_id,
+                'status': 'completed',
+                'xp_gained': quest['xp_reward'],
+                'gold_gained': quest['gold_reward']
+            })
+        elif quest['status'] != 'active':
+            results.append({'quest_id': quest_id, 'status': 'already_completed'})
+        else:
+            results.append({'quest_id': quest_id, 'status': 'verification_required'})
+    
+    completed = sum(1 for r in results if r['status'] == 'completed')
+    if not completed:
+        return {'completed': 0, 'xp_gained': 0, 'gold_gained': 0, 'results': results}, None
+    
+    # Boosts are spent one quest at a time, so batches never consume them.
+    before, after = await _grant_reward(user_id, total_xp, total_gold, session=session)
+    await db.events.insert_many(
+        [quest_completed_event(user_id, q, q['xp_reward'], q['gold_reward'], after) for q in moved],
+        session=session
+    )
+    return {
+        'completed': completed,
+        'xp_gained': total_xp,
+        'gold_gained': total_gold,
+        'new_level': after['level'],
+        'level_up': after['level'] > before.get('level', 1),
+        'new_streak': after['streak'],
+        'results': results
+    }, after
+
+@api_router.post("/quests/complete/bulk")
+async def complete_quests_bulk(payload: BulkComplete, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    quest_ids = list(dict.fromkeys(payload.quest_ids))
+    if not quest_ids:
+        raise HTTPException(status_code=400, detail="No quest ids given")
+    if len(quest_ids) > QUEST_BULK_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {QUEST_BULK_LIMIT} quests per request")
+    
+    result, after = await _in_quest_transaction(_complete_quests_bulk, user['id'], quest_ids)
+    
+    if after:
+        _publish_progress(user['id'], after)
+        await _share_user_changes([user['id']])
+    return result
+
 @api_router.post("/quests/generate")
 async def generate_quest(category: str = "productivity", authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+    user = await get_current_user(authorization or "", fields=('id', 'level'))
 
-    # Local fallback quest generator (Emergent AI removed)
-    quest = Quest(
-        user_id=user['id'],
-        title=f"{category.title()} Challenge",
-        description=f"Complete one meaningful {category} task today.",
-        quest_type="daily",
-        difficulty="medium",
-        xp_reward=100,
-        gold_reward=25,
-        category=category
-    )
+    # Pre-generated by quest_pool in the background (Emergent AI removed)
+    quest = Quest(user_id=user['id'], **quest_pool.take(category, user.get('level', 1)))
 
     quest_dict = quest.model_dump()
     await db.quests.insert_one(quest_dict)
+    quest_dict.pop('_id', None)
+    versions.bump(f"user:{user['id']}")
+    await _share_user_changes([user['id']])
 
-    return quest
+    return json_response(quest_dict)
 
 # @api_router.post("/quests/generate")
 # async def generate_quest(category: str = "productivity", authorization: str = Header(None)):
@@ -391,72 +884,170 @@ async def generate_quest(category: str = "productivity", authorization: str = He
 #         raise HTTPException(status_code=500, detail="Failed to generate quest")
 
 # Verification Routes
+async def _read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    buffer = bytearray()
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Photo exceeds {max_bytes} bytes")
+    return bytes(buffer)
+
+async def _normalize_upload(upload: UploadFile) -> dict:
+    # The raw upload is only referenced in here, so its buffer is freed with the slot.
+    if photo_buffers.locked():
+        raise HTTPException(status_code=503, detail="Image processing is busy, try again", headers={'Retry-After': '1'})
+    async with photo_buffers:
+        contents = await _read_upload(upload, PHOTO_MAX_BYTES)
+        try:
+            return await image_pipeline.process(contents)
+        except ImagePoolBusy:
+            raise HTTPException(status_code=503, detail="Image processing is busy, try again", headers={'Retry-After': '1'})
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def _parse_range(range_header: str, size: int):
+    # Only single "bytes=" ranges are supported; anything else gets the full body.
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    start_s, _, end_s = range_header[len('bytes='):].strip().partition('-')
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            start = max(size - int(end_s), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={'Content-Range': f'bytes */{size}'})
+    return start, end
+
 @api_router.post("/verification/photo")
 async def submit_photo_verification(quest_id: str = Form(...), photo: UploadFile = File(...), authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
     
-    quest = await db.quests.find_one({'id': quest_id, 'user_id': user['id']}, {'_id': 0})
+    quest = await db.quests.find_one({'id': quest_id, 'user_id': user['id']}, {'_id': 0, 'id': 1})
     if not quest:
         raise HTTPException(status_code=404, detail="Quest not found")
     
-    contents = await photo.read()
-    photo_base64 = base64.b64encode(contents).decode('utf-8')
+    normalized = await _normalize_upload(photo)
+    photo_ref, thumbnail_ref = await asyncio.gather(
+        photo_store.put(normalized['image'], 'image/jpeg'),
+        photo_store.put(normalized['thumbnail'], 'image/jpeg')
+    )
+    photo_ref.update({
+        'width': normalized['width'],
+        'height': normalized['height'],
+        'thumbnail_id': thumbnail_ref['photo_id']
+    })
     
     await db.quests.update_one(
         {'id': quest_id},
         {'$set': {
             'verification_required': True,
             'verification_type': 'photo',
-            'verification_data': {'photo': photo_base64}
+            'verification_data': photo_ref
         }}
     )
     
-    return {'message': 'Photo verification submitted'}
+    return {'message': 'Photo verification submitted', 'photo_id': photo_ref['photo_id']}
+
+@api_router.get("/verification/photo/{quest_id}")
+async def get_verification_photo(quest_id: str, thumbnail: bool = False, authorization: str = Header(None), range: Optional[str] = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    quest = await db.quests.find_one(
+        {'id': quest_id, 'user_id': user['id'], 'verification_type': 'photo'},
+        {'_id': 0, 'verification_data': 1}
+    )
+    photo_ref = (quest or {}).get('verification_data') or {}
+    if 'photo' in photo_ref:
+        # Quests verified before photos moved out of the document
+        return Response(base64.b64decode(photo_ref['photo']), media_type='application/octet-stream')
+    photo_id = photo_ref.get('thumbnail_id' if thumbnail else 'photo_id')
+    if not photo_id:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    size = await photo_store.size(photo_id)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    headers = {'Accept-Ranges': 'bytes', 'ETag': f'"{photo_id}"'}
+    byte_range = _parse_range(range, size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    
+    return StreamingResponse(
+        photo_store.open(photo_id, start, end),
+        status_code=status_code,
+        media_type=photo_ref.get('content_type', 'application/octet-stream'),
+        headers=headers
+    )
+
 @api_router.post("/verification/quiz/generate")
-async def generate_quiz(quest_id: str, notes: str, authorization: str = Header(None)):
-    user = await get_current_user(authorization or "")
+async def generate_quiz(quiz_data: QuizGenerate, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
 
-    quest = await db.quests.find_one({'id': quest_id, 'user_id': user['id']}, {'_id': 0})
-    if not quest:
+    # Static templates (AI removed); the quest only references them.
+    template = get_template(quiz_data.template_id)
+    if template is None:
+        raise HTTPException(status_code=400, detail="Unknown quiz template")
+
+    note_id = notes_id(quiz_data.notes)
+    _, result = await asyncio.gather(
+        store_notes(db, note_id, quiz_data.notes),
+        db.quests.update_one(
+            {'id': quiz_data.quest_id, 'user_id': user['id']},
+            {'$set': {
+                'verification_type': 'quiz',
+                'verification_data': quiz_reference(quiz_data.template_id, note_id)
+            }}
+        )
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Quest not found")
 
-    # Static quiz (AI removed)
-    questions = [
-        {
-            "question": "Did you complete the task honestly?",
-            "options": ["Yes", "No", "Partially", "Skipped"],
-            "correct_answer": 0
-        },
-        {
-            "question": "Did you understand what you worked on?",
-            "options": ["Yes", "Somewhat", "No", "Not sure"],
-            "correct_answer": 0
-        },
-        {
-            "question": "Would you repeat this task tomorrow?",
-            "options": ["Yes", "Maybe", "No", "Not sure"],
-            "correct_answer": 0
-        }
-    ]
+    return {"template_id": quiz_data.template_id, "questions": template['questions']}
 
+@api_router.post("/verification/quiz/submit")
+async def submit_quiz(quiz_data: QuizAnswer, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    quest = await db.quests.find_one(
+        {'id': quiz_data.quest_id, 'user_id': user['id'], 'verification_type': 'quiz'},
+        {'_id': 0, 'verification_data': 1}
+    )
+    if not quest or not quest.get('verification_data'):
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    try:
+        result = grade(quest['verification_data'], quiz_data.answers)
+    except QuizError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     await db.quests.update_one(
-        {'id': quest_id},
-        {'$set': {
-            'verification_type': 'quiz',
-            'verification_data': {
-                'notes': notes,
-                'questions': questions,
-                'passed': False
-            }
-        }}
+        {'id': quiz_data.quest_id},
+        {
+            '$set': {
+                'verification_required': result['passed'],
+                'verification_data.passed': result['passed'],
+                'verification_data.score': result['score']
+            },
+            '$inc': {'verification_data.attempts': 1}
+        }
     )
-
-    return {
-        "questions": [
-            {"question": q["question"], "options": q["options"]}
-            for q in questions
-        ]
-    }
+    
+    return result
 
 # @api_router.post("/verification/quiz/generate")
 # async def generate_quiz(quest_id: str, notes: str, authorization: str = Header(None)):
@@ -496,82 +1087,297 @@ async def generate_quiz(quest_id: str, notes: str, authorization: str = Header(N
 #         logging.error(f"Quiz generation error: {e}")
 #         raise HTTPException(status_code=500, detail="Failed to generate quiz")
 
-# @api_router.post("/verification/quiz/submit")
-# async def submit_quiz(quiz_data: QuizAnswer, authorization: str = ""):
-#     user = await get_current_user(authorization)
-    
-#     quest = await db.quests.find_one({'id': quiz_data.quest_id, 'user_id': user['id']}, {'_id': 0})
-#     if not quest or not quest.get('verification_data'):
-#         raise HTTPException(status_code=404, detail="Quiz not found")
-    
-#     questions = quest['verification_data']['questions']
-#     score = sum(1 for i, answer in enumerate(quiz_data.answers) if int(answer) == questions[i]['correct_answer'])
-#     passed = score >= 2
-    
-#     await db.quests.update_one(
-#         {'id': quiz_data.quest_id},
-#         {'$set': {
-#             'verification_required': passed,
-#             'verification_data.passed': passed,
-#             'verification_data.score': score
-#         }}
-#     )
-    
-#     return {'passed': passed, 'score': score, 'total': len(questions)}
-
 # Leaderboard
+@flights.coalesce(ttl=LEADERBOARD_PAGE_TTL)
+async def _leaderboard_page(etag: str, offset: int, limit: int) -> bytes:
+    return orjson.dumps(leaderboard.page(offset, limit))
+
 @api_router.get("/leaderboard")
-async def get_leaderboard():
-    users = await db.users.find(
-        {},
-        {'_id': 0, 'username': 1, 'level': 1, 'xp': 1, 'avatar.avatar_image': 1}
-    ).sort('xp', -1).limit(50).to_list(50)
+async def get_leaderboard(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None)
+):
+    etag = versions.etag('leaderboard')
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PUBLIC_CACHE)
+    
+    body = await _leaderboard_page(etag, offset, limit)
+    return with_etag(Response(body, media_type='application/json'), etag, PUBLIC_CACHE)
+
+@api_router.get("/leaderboard/me")
+async def get_my_rank(authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    rank = leaderboard.rank(user['id'])
+    if rank is None:
+        raise HTTPException(status_code=404, detail="User not on leaderboard")
     
-    return users
+    return json_response({**leaderboard.entry(user['id']), 'rank': rank, 'total': len(leaderboard)})
 
 # Shop
+# Built once; ids are stable slugs so clients can refer to items across restarts.
+SHOP_ITEMS = [
+    ShopItem(id="health_potion", name="Health Potion", description="Restore 50 HP", cost=50, item_type="consumable", effect="hp+50"),
+    ShopItem(id="xp_boost", name="XP Boost", description="2x XP for next quest", cost=100, item_type="boost", effect="xp_x2"),
+    ShopItem(id="gold_multiplier", name="Gold Multiplier", description="2x Gold for next quest", cost=150, item_type="boost", effect="gold_x2"),
+    ShopItem(id="streak_shield", name="Streak Shield", description="Protect streak for 1 day", cost=200, item_type="protection", effect="streak_shield"),
+]
+SHOP_ITEMS_BY_ID = {item.id: item for item in SHOP_ITEMS}
+SHOP_ITEMS_JSON = orjson.dumps([item.model_dump() for item in SHOP_ITEMS])
+SHOP_ITEMS_ETAG = static_etag(SHOP_ITEMS_JSON)
+SHOP_CACHE = 'public, max-age=300'
+
 @api_router.get("/shop/items")
-async def get_shop_items():
-    items = [
-        ShopItem(name="Health Potion", description="Restore 50 HP", cost=50, item_type="consumable", effect="hp+50"),
-        ShopItem(name="XP Boost", description="2x XP for next quest", cost=100, item_type="boost", effect="xp_x2"),
-        ShopItem(name="Gold Multiplier", description="2x Gold for next quest", cost=150, item_type="boost", effect="gold_x2"),
-        ShopItem(name="Streak Shield", description="Protect streak for 1 day", cost=200, item_type="protection", effect="streak_shield"),
-    ]
+async def get_shop_items(if_none_match: Optional[str] = Header(None)):
+    if etag_matches(if_none_match, SHOP_ITEMS_ETAG):
+        return not_modified(SHOP_ITEMS_ETAG, SHOP_CACHE)
+    return Response(
+        SHOP_ITEMS_JSON,
+        media_type='application/json',
+        headers={'ETag': SHOP_ITEMS_ETAG, 'Cache-Control': SHOP_CACHE}
+    )
+
+INVENTORY_FIELDS = {'_id': 0, 'gold': 1, 'hp': 1, 'inventory': 1, 'active_boosts': 1}
+
+def _shop_item(item_id: str) -> ShopItem:
+    item = SHOP_ITEMS_BY_ID.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+def _use_update(item: ShopItem):
+    # Pipeline form only where the new value depends on another field.
+    if item.effect.startswith('hp+'):
+        return [{'$set': {
+            'hp': {'$min': [
+                {'$ifNull': ['$max_hp', 100]},
+                {'$add': [{'$ifNull': ['$hp', 100]}, int(item.effect[3:])]}
+            ]},
+            f'inventory.{item.id}': {'$subtract': [f'$inventory.{item.id}', 1]}
+        }}]
+    return {'$inc': {f'inventory.{item.id}': -1, f'active_boosts.{item.effect}': 1}}
+
+def _inventory_view(user: dict) -> dict:
+    return {
+        'gold': user.get('gold', 0),
+        'hp': user.get('hp', 100),
+        'inventory': {k: v for k, v in (user.get('inventory') or {}).items() if v > 0},
+        'active_boosts': {k: v for k, v in (user.get('active_boosts') or {}).items() if v > 0}
+    }
+
+@api_router.post("/shop/purchase")
+async def purchase_item(purchase: Purchase, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    item = _shop_item(purchase.item_id)
+    cost = item.cost * purchase.quantity
+    
+    # The gold guard and the debit are one write, so parallel purchases cannot overspend.
+    updated = await db.users.find_one_and_update(
+        {'id': user['id'], 'gold': {'$gte': cost}},
+        {'$inc': {'gold': -cost, f'inventory.{item.id}': purchase.quantity}},
+        projection=INVENTORY_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=400, detail="Not enough gold")
     
-    return [item.model_dump() for item in items]
+    user_cache.update(user['id'], {'gold': updated['gold'], 'inventory': updated['inventory']})
+    versions.bump(f"user:{user['id']}")
+    await _share_user_changes([user['id']])
+    
+    return json_response(_inventory_view(updated))
+
+@api_router.post("/inventory/use")
+async def use_item(use: UseItem, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    item = _shop_item(use.item_id)
+    
+    updated = await db.users.find_one_and_update(
+        {'id': user['id'], f'inventory.{item.id}': {'$gte': 1}},
+        _use_update(item),
+        projection=INVENTORY_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=400, detail="Item not in inventory")
+    
+    user_cache.update(user['id'], {k: updated[k] for k in ('hp', 'inventory', 'active_boosts') if k in updated})
+    versions.bump(f"user:{user['id']}")
+    await _share_user_changes([user['id']])
+    
+    return json_response(_inventory_view(updated))
+
+@api_router.get("/inventory")
+async def get_inventory(authorization: str = Header(None)):
+    user_id = get_token_user_id(authorization or "")
+    user = await db.users.find_one({'id': user_id}, INVENTORY_FIELDS)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return json_response(_inventory_view(user))
 
 # Friends
 @api_router.post("/friends/add")
-async def add_friend(friend_req: FriendRequest, authorization: str = ""):
-    user = await get_current_user(authorization)
+async def add_friend(friend_req: FriendRequest, authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
     
-    friend = await db.users.find_one({'username': friend_req.friend_username}, {'_id': 0})
+    friend = await db.users.find_one({'username': friend_req.friend_username}, {'_id': 0, 'id': 1})
     if not friend:
         raise HTTPException(status_code=404, detail="User not found")
+    if friend['id'] == user['id']:
+        raise HTTPException(status_code=400, detail="You cannot add yourself as a friend")
     
-    await db.friends.insert_one({
-        'id': str(uuid.uuid4()),
-        'user_id': user['id'],
-        'friend_id': friend['id'],
-        'created_at': datetime.now(timezone.utc).isoformat()
-    })
+    try:
+        await db.friends.update_one(
+            {'user_id': user['id'], 'friend_id': friend['id']},
+            {'$setOnInsert': {
+                'id': str(uuid.uuid4()),
+                'created_at': datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent add of the same friend won the upsert
+        pass
     
     return {'message': 'Friend added successfully'}
 
 @api_router.get("/friends")
-async def get_friends(authorization: str = ""):
-    user = await get_current_user(authorization)
+async def get_friends(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    authorization: str = Header(None)
+):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    friends = await db.friends.aggregate([
+        {'$match': {'user_id': user['id']}},
+        {'$sort': {'friend_id': 1}},
+        {'$skip': offset},
+        {'$limit': limit},
+        {'$lookup': {'from': 'users', 'localField': 'friend_id', 'foreignField': 'id', 'as': 'friend'}},
+        {'$unwind': '$friend'},
+        {'$replaceRoot': {'newRoot': '$friend'}},
+        {'$project': {'_id': 0, 'username': 1, 'level': 1, 'xp': 1, 'avatar': 1}}
+    ]).to_list(limit)
+    
+    return json_response(friends)
+
+@api_router.get("/friends/leaderboard")
+async def get_friends_leaderboard(authorization: str = Header(None)):
+    user = await get_current_user(authorization or "", fields=USER_ID_ONLY)
+    
+    # Covered by the (user_id, friend_id) index; XP comes from the in-memory leaderboard.
+    friendships = await db.friends.find(
+        {'user_id': user['id']},
+        {'_id': 0, 'friend_id': 1}
+    ).to_list(FRIENDS_MAX)
+    
+    member_ids = {f['friend_id'] for f in friendships}
+    member_ids.add(user['id'])
+    ranked = sorted(
+        (user_id for user_id in member_ids if leaderboard.entry(user_id)),
+        key=lambda user_id: (-leaderboard.entry(user_id)['xp'], user_id)
+    )
+    
+    return json_response([
+        {**leaderboard.entry(user_id), 'rank': rank, 'global_rank': leaderboard.rank(user_id), 'is_me': user_id == user['id']}
+        for rank, user_id in enumerate(ranked, start=1)
+    ])
+
+# System
+def _component_stats() -> dict:
+    return {
+        'user_cache': user_cache.stats(),
+        'password_pool': password_pool.stats(),
+        'image_pipeline': image_pipeline.stats(),
+        'quest_pool': quest_pool.stats(),
+        'streak_decay': streak_job.stats(),
+        'events': event_processor.stats(),
+        'push': push_hub.stats(),
+        'cache_backend': cache_backend.stats(),
+        'single_flight': flights.stats(),
+        'leaderboard': {'users': len(leaderboard)},
+    }
+
+# Operator endpoints stay off the public /api prefix
+@app.get("/system/stats", include_in_schema=False)
+async def get_system_stats():
+    return _component_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(_component_stats()), media_type='text/plain; version=0.0.4')
+
+# Push channel
+async def _authenticate_socket(websocket: WebSocket) -> Optional[str]:
+    # Browsers cannot set headers on a WebSocket, and a ?token= query string ends
+    # up in access logs, so the JWT comes as the first message: {"type": "auth", "token": ...}
+    try:
+        message = orjson.loads(await asyncio.wait_for(websocket.receive_text(), PUSH_AUTH_TIMEOUT))
+        if not isinstance(message, dict) or message.get('type') != 'auth':
+            return None
+        return get_token_user_id(f"Bearer {message.get('token') or ''}")
+    except (asyncio.TimeoutError, orjson.JSONDecodeError, HTTPException, WebSocketDisconnect):
+        return None
+    except KeyError:
+        # receive_text() on a binary frame
+        return None
+
+@api_router.websocket("/ws")
+async def push_socket(websocket: WebSocket):
+    await websocket.accept()
+    user_id = await _authenticate_socket(websocket)
+    if user_id is None:
+        await websocket.close(code=1008)
+        return
     
-    friendships = await db.friends.find({'user_id': user['id']}, {'_id': 0}).to_list(100)
-    friend_ids = [f['friend_id'] for f in friendships]
+    subscriber = push_hub.subscribe(user_id)
     
-    friends = await db.users.find(
-        {'id': {'$in': friend_ids}},
-        {'_id': 0, 'username': 1, 'level': 1, 'xp': 1, 'avatar': 1}
-    ).to_list(100)
+    async def send():
+        while True:
+            message = await subscriber.next()
+            if message is None:
+                await websocket.close(code=1013, reason="Too slow, reconnect")
+                return
+            await websocket.send_text(message)
     
-    return friends
+    async def receive():
+        # Client messages are ignored; reading is how a disconnect is noticed.
+        while True:
+            await websocket.receive_text()
+    
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await websocket.send_text(orjson.dumps({'type': 'ready', 'rank': leaderboard.rank(user_id)}).decode())
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        push_hub.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# Streak decay
+async def _on_streak_batch(reset: List[str], shielded: List[str]):
+    # The bulk write does not say which guarded updates matched: a user who
+    # completed a quest meanwhile kept the streak, so drop rather than patch.
+    for user_id in reset + shielded:
+        user_cache.invalidate(user_id)
+        versions.bump(f"user:{user_id}")
+    await _share_user_changes(reset + shielded)
+
+streak_job = create_streak_job(db, on_batch=_on_streak_batch)
+
+# Event consumers
+async def _on_badges_awarded(user_id: str, badges: List[str]):
+    user_cache.invalidate(user_id)
+    versions.bump(f"user:{user_id}")
+    await _share_user_changes([user_id])
+
+event_processor = create_event_processor(db, [
+    RollupConsumer(db, badges=BadgeAwarder(db, on_awarded=_on_badges_awarded)),
+    LeaderboardConsumer(db, leaderboard, on_change=lambda: versions.bump('leaderboard')),
+])
 
 app.include_router(api_router)
 
@@ -583,15 +1389,140 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and times the whole stack
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+# Lifespan
+# Seconds between warm-up attempts while the database is unreachable
+WARM_UP_RETRY_SECONDS = float(os.getenv('WARM_UP_RETRY_SECONDS', '5'))
+HEALTH_PING_TIMEOUT = float(os.getenv('HEALTH_PING_TIMEOUT', '2'))
+
+readiness = {'ready': False, 'failed': False, 'warm_up_seconds': None, 'last_error': None}
+warm_up_task: Optional[asyncio.Task] = None
+
+class TransactionsUnsupported(RuntimeError):
+    pass
+
+async def _check_transactions():
+    hello = await db.command('hello')
+    if QUEST_TRANSACTIONS and not (hello.get('setName') or hello.get('msg') == 'isdbgrid'):
+        raise TransactionsUnsupported(
+            "MongoDB is a standalone server, which has no transactions; run a replica set "
+            "or set QUEST_TRANSACTIONS=false for development"
+        )
+    if not QUEST_TRANSACTIONS:
+        logger.warning("QUEST_TRANSACTIONS is off: a crash during quest completion can lose its reward or outbox event")
+
+async def bootstrap():
+    # What only an operator can fix (no transactions, conflicting indexes) raises here and fails startup
+    await db.command('ping')
+    await _check_transactions()
+    await ensure_indexes(db)
+
+async def warm_up():
+    # Opens the pool and fills in-memory state before reporting ready
+    start = time.perf_counter()
+    await asyncio.gather(*(db.command('ping') for _ in range(MONGO_MIN_POOL_SIZE)))
+    await leaderboard.rebuild(db)
+    await quest_pool.start()
+    event_processor.start()
+    streak_job.start()
+    readiness['warm_up_seconds'] = round(time.perf_counter() - start, 3)
+    readiness['ready'] = True
+    logger.info(f"Warm-up finished in {readiness['warm_up_seconds']}s")
+
+def _warm_up_unreachable(e: ConnectionFailure):
+    readiness['last_error'] = str(e)
+    logger.error(f"Database unreachable during warm-up, retrying in {WARM_UP_RETRY_SECONDS}s: {e}")
+
+async def _warm_up_until_ready(bootstrapped: bool):
+    # Only an unreachable database is retried (ServerSelectionTimeoutError is a
+    # ConnectionFailure), so a deploy during an outage stays live
+    delay = 0 if bootstrapped else WARM_UP_RETRY_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        delay = WARM_UP_RETRY_SECONDS
+        try:
+            if not bootstrapped:
+                await bootstrap()
+                bootstrapped = True
+            await warm_up()
+            return
+        except ConnectionFailure as e:
+            _warm_up_unreachable(e)
+        except Exception as e:
+            # Too late to fail startup; /health/live reports it so the process gets replaced
+            readiness['failed'] = True
+            readiness['last_error'] = str(e)
+            logger.critical(f"Warm-up failed and will not be retried: {e}")
+            return
+
+# What `uvicorn --workers` and gunicorn default to
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+def _check_workers(workers: int):
+    # ETag versions and cached users only reach other workers through a shared backend
+    if workers > 1 and not cache_backend.shared:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} needs CACHE_BACKEND=mmap or redis; with memory, workers keep "
+            "serving cached users and answering 304 after another worker changed the data"
+        )
+
+async def startup():
+    global warm_up_task
+    _check_workers(WEB_CONCURRENCY)
+    try:
+        await bootstrap()
+        bootstrapped = True
+    except ConnectionFailure as e:
+        _warm_up_unreachable(e)
+        bootstrapped = False
+    cache_backend.start(_on_cache_message)
+    warm_up_task = asyncio.create_task(_warm_up_until_ready(bootstrapped))
+
+async def shutdown():
+    readiness['ready'] = False
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+    await event_processor.stop()
+    await streak_job.stop()
+    await quest_pool.stop()
+    await cache_backend.stop()
     client.close()
+    image_pipeline.shutdown()
+    password_pool.shutdown()
+
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    if readiness['failed']:
+        return json_response({'status': 'failed', 'last_error': readiness['last_error']}, status_code=503)
+    return {'status': 'live'}
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    if not readiness['ready']:
+        status = 'failed' if readiness['failed'] else 'warming_up'
+        return json_response({'status': status, 'last_error': readiness['last_error']}, status_code=503)
+    try:
+        await asyncio.wait_for(db.command('ping'), HEALTH_PING_TIMEOUT)
+    except Exception as e:
+        return json_response({'status': 'database_unavailable', 'error': str(e)}, status_code=503)
+    return {'status': 'ready', 'warm_up_seconds': readiness['warm_up_seconds']}
 
 #uvicorn server:app --reload
+
+if __name__ == '__main__':
+    import uvicorn
+    try:
+        _check_workers(WEB_CONCURRENCY)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    uvicorn.run('server:app', host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', '8000')), workers=WEB_CONCURRENCY)
 # python -m uvicorn server:app --reload
\ No newline at end of file
@@ -0,0 +1,114 @@
+import asyncio
+import copy
+import functools
+import inspect
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Optional
+
+from starlette.responses import Response, StreamingResponse
+
+
+def _copy_response(result):
+    # Middleware may add headers to a response in place; each caller gets its own header list.
+    if isinstance(result, Response):
+        result = copy.copy(result)
+        result.raw_headers = list(result.raw_headers)
+    return result
+
+
+class SingleFlight:
+    """Concurrent identical calls share one execution and its result.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task. With a ``ttl`` the result is also kept
+    for that many seconds, so a burst right after it finishes is served from
+    memory too. Results are shared, so callers must not mutate them.
+
+    The task is shielded: a leader whose client disconnects does not cancel
+    the call for everyone else.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._cache: Dict[tuple, tuple] = {}
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {'calls': 0, 'executed': 0, 'coalesced': 0, 'cache_hits': 0})
+
+    async def do(self, key: tuple, fn: Callable, *args, ttl: float = 0, **kwargs):
+        counts = self._counts[key[0]]
+        counts['calls'] += 1
+
+        if ttl:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                counts['cache_hits'] += 1
+                return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            counts['executed'] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._finished, key, ttl))
+        else:
+            counts['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: tuple, ttl: float, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if ttl and not task.cancelled() and task.exception() is None:
+            if len(self._cache) >= self.max_entries:
+                self._evict()
+            self._cache[key] = (time.monotonic() + ttl, task.result())
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[key]
+        # Still full: drop the oldest entries
+        while len(self._cache) >= self.max_entries:
+            del self._cache[next(iter(self._cache))]
+
+    def coalesce(self, ttl: float = 0, vary: Optional[Iterable[str]] = None):
+        """Decorator for async functions and read routes.
+
+        The key is the function plus its arguments, or only the arguments
+        named in ``vary``. Leave out anything the result depends on and
+        callers get each other's results: a route that answers
+        ``If-None-Match`` itself should not be keyed without it.
+        """
+        def decorator(fn):
+            signature = inspect.signature(fn)
+            name = fn.__qualname__
+            names = tuple(vary) if vary is not None else tuple(signature.parameters)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (name,) + tuple(bound.arguments[n] for n in names)
+                result = await self.do(key, fn, *args, ttl=ttl, **kwargs)
+                if isinstance(result, StreamingResponse):
+                    raise TypeError(f"{name} returns a StreamingResponse, which cannot be shared")
+                return _copy_response(result)
+
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        totals = {'calls': 0, 'executed': 0, 'coalesced': 0, 'cache_hits': 0}
+        for counts in self._counts.values():
+            for k, v in counts.items():
+                totals[k] += v
+        return {
+            **totals,
+            'in_flight': len(self._inflight),
+            'cached': len(self._cache),
+            'functions': {name: dict(counts) for name, counts in self._counts.items()},
+        }
+
+
+def create_single_flight() -> SingleFlight:
+    return SingleFlight(max_entries=int(os.getenv('SINGLEFLIGHT_CACHE_ENTRIES', '1024')))
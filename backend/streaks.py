@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'streak_decay'
+SCAN_FIELDS = {'_id': 0, 'id': 1, 'last_quest_date': 1, 'active_boosts.streak_shield': 1}
+
+
+class StreakDecayJob:
+    """Resets lapsed streaks once per UTC day, in batches.
+
+    A streak has lapsed when the user's last quest was before yesterday. A
+    user who missed exactly one day and holds a ``streak_shield`` charge
+    spends it instead: ``last_quest_date`` moves to yesterday and the streak
+    survives. Progress is checkpointed in ``jobs`` after every batch, under a
+    lease, so a restarted or second worker resumes instead of rescanning.
+    """
+
+    def __init__(self, db, batch_size: int, lease_seconds: float = 300,
+                 on_batch: Optional[Callable[[List[str], List[str]], Awaitable[None]]] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.on_batch = on_batch
+        self.owner = uuid.uuid4().hex
+        self.running = False
+        self.last_run: Optional[dict] = None
+        self._task = None
+
+    async def _acquire(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.db.jobs.find_one_and_update(
+                {'_id': JOB_ID, '$or': [
+                    {'lease_until': {'$exists': False}},
+                    {'lease_until': {'$lt': now}},
+                    {'owner': self.owner},
+                ]},
+                {'$set': {'owner': self.owner, 'lease_until': now + self.lease}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The job document exists and another worker holds the lease.
+            return None
+
+    async def _checkpoint(self, fields: dict):
+        await self.db.jobs.update_one(
+            {'_id': JOB_ID, 'owner': self.owner},
+            {'$set': {'lease_until': datetime.now(timezone.utc) + self.lease, **fields}}
+        )
+
+    async def run(self, today: date) -> Optional[dict]:
+        job = await self._acquire()
+        if job is None:
+            logger.info("Streak decay is running in another worker")
+            return None
+        if job.get('day') == today.isoformat() and job.get('done'):
+            self.last_run = job.get('report')
+            return self.last_run
+
+        resume = job.get('day') == today.isoformat()
+        after = job.get('after') if resume else None
+        totals = dict(job.get('totals') or {}) if resume else {}
+        for key in ('processed', 'reset', 'shielded', 'seconds'):
+            totals.setdefault(key, 0)
+        if not resume:
+            await self._checkpoint({'day': today.isoformat(), 'done': False, 'after': None, 'totals': totals})
+
+        yesterday = (today - timedelta(days=1)).isoformat()
+        day_before = (today - timedelta(days=2)).isoformat()
+        self.running = True
+        start = time.perf_counter()
+        try:
+            while True:
+                query = {'streak': {'$gt': 0}, 'last_quest_date': {'$lt': yesterday}}
+                if after:
+                    query['$or'] = [
+                        {'last_quest_date': {'$gt': after['last_quest_date']}},
+                        {'last_quest_date': after['last_quest_date'], 'id': {'$gt': after['id']}},
+                    ]
+                batch = await self.db.users.find(query, SCAN_FIELDS).sort(
+                    [('last_quest_date', 1), ('id', 1)]
+                ).limit(self.batch_size).to_list(self.batch_size)
+                if not batch:
+                    break
+
+                requests, reset, shielded = [], [], []
+                for user in batch:
+                    # Matching on the date we read skips users who completed a quest since.
+                    guard = {'id': user['id'], 'last_quest_date': user['last_quest_date']}
+                    shields = (user.get('active_boosts') or {}).get('streak_shield', 0)
+                    if shields > 0 and user['last_quest_date'] == day_before:
+                        requests.append(UpdateOne(
+                            {**guard, 'active_boosts.streak_shield': {'$gte': 1}},
+                            {'$set': {'last_quest_date': yesterday}, '$inc': {'active_boosts.streak_shield': -1}}
+                        ))
+                        shielded.append(user['id'])
+                    else:
+                        requests.append(UpdateOne(guard, {'$set': {'streak': 0}}))
+                        reset.append(user['id'])
+                await self.db.users.bulk_write(requests, ordered=False)
+
+                last = batch[-1]
+                after = {'last_quest_date': last['last_quest_date'], 'id': last['id']}
+                totals['processed'] += len(batch)
+                totals['reset'] += len(reset)
+                totals['shielded'] += len(shielded)
+                await self._checkpoint({'after': after, 'totals': {**totals, 'seconds': totals['seconds'] + time.perf_counter() - start}})
+                if self.on_batch:
+                    await self.on_batch(reset, shielded)
+        finally:
+            self.running = False
+
+        totals['seconds'] += time.perf_counter() - start
+        report = {
+            'day': today.isoformat(),
+            **totals,
+            'users_per_sec': round(totals['processed'] / totals['seconds'], 1) if totals['seconds'] else 0.0,
+        }
+        await self._checkpoint({'done': True, 'totals': totals, 'report': report, 'lease_until': datetime.now(timezone.utc)})
+        self.last_run = report
+        logger.info(
+            f"Streak decay for {report['day']}: {report['processed']} users "
+            f"({report['reset']} reset, {report['shielded']} shielded) at {report['users_per_sec']} users/s"
+        )
+        return report
+
+    async def _run_forever(self):
+        while True:
+            try:
+                report = await self.run(datetime.now(timezone.utc).date())
+            except Exception as e:
+                logger.error(f"Streak decay failed: {e}")
+                report = None
+            now = datetime.now(timezone.utc)
+            next_day = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            delay = (next_day - now).total_seconds() + 1
+            if report is None:
+                # Failed or leased elsewhere: try again (and resume) once the lease can have expired.
+                delay = min(delay, self.lease.total_seconds())
+            await asyncio.sleep(delay)
+
+    def start(self):
+        # Runs once right away, which also resumes an interrupted run.
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {'running': self.running, 'batch_size': self.batch_size, 'last_run': self.last_run}
+
+
+def create_streak_job(db, on_batch=None) -> StreakDecayJob:
+    return StreakDecayJob(
+        db,
+        batch_size=int(os.getenv('STREAK_DECAY_BATCH', '1000')),
+        on_batch=on_batch,
+    )
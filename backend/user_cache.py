@@ -0,0 +1,148 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import orjson
+
+# Written to the shared tier when a user changes; fills use nx=True, so a
+# document read before the change cannot be written back over it.
+TOMBSTONE = b'\x00'
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        return entry[1] if entry and entry[0] > time.monotonic() else None
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class UserCache:
+    """Decoded JWTs and user documents (without ``password_hash``) for auth.
+
+    Routes that write to a user must call ``update`` or ``invalidate`` after
+    the write so later requests in this process never see the old document.
+
+    With a shared cache backend, user documents are also kept there for the
+    other workers. ``share_change`` must then follow every write; it leaves a
+    tombstone for ``hold`` seconds so a stale fill cannot land meanwhile.
+    """
+
+    def __init__(self, max_users: int, ttl: float, backend=None, hold: float = 2.0):
+        self.tokens = TTLCache(max_users, ttl)
+        self.users = TTLCache(max_users, ttl)
+        # Only worth a second lookup when other workers can see it
+        self.shared = backend if backend is not None and backend.shared else None
+        self.hold = hold
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def get_token(self, token: str) -> Optional[dict]:
+        return self.tokens.get(token)
+
+    def set_token(self, token: str, payload: dict):
+        # Never keep a token past its own expiry.
+        self.tokens.set(token, payload, ttl=payload.get('exp', 0) - time.time())
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        return self.users.get(user_id)
+
+    def set_user(self, user: dict):
+        self.users.set(user['id'], user)
+
+    async def load_user(self, user_id: str) -> Optional[dict]:
+        user = self.users.get(user_id)
+        if user is None and self.shared is not None:
+            raw = await self.shared.get(f'user:{user_id}')
+            if raw and raw != TOMBSTONE:
+                self.shared_hits += 1
+                user = orjson.loads(raw)
+                self.users.set(user_id, user)
+            else:
+                self.shared_misses += 1
+        return user
+
+    async def store_user(self, user: dict):
+        self.set_user(user)
+        if self.shared is not None:
+            await self.shared.set(f"user:{user['id']}", orjson.dumps(user), ttl=self.users.ttl, nx=True)
+
+    async def share_change(self, user_id: str):
+        if self.shared is not None:
+            await self.shared.set(f'user:{user_id}', TOMBSTONE, ttl=self.hold)
+
+    def update(self, user_id: str, fields: dict):
+        user = self.users.peek(user_id)
+        if user is not None:
+            self.users.set(user_id, {**user, **fields})
+
+    def invalidate(self, user_id: str):
+        self.users.delete(user_id)
+
+    def clear_users(self):
+        self.users.clear()
+
+    def stats(self) -> dict:
+        return {
+            'tokens': self.tokens.stats(),
+            'users': self.users.stats(),
+            'shared_hits': self.shared_hits,
+            'shared_misses': self.shared_misses,
+        }
+
+
+def create_user_cache(backend=None) -> UserCache:
+    return UserCache(
+        max_users=int(os.getenv('USER_CACHE_SIZE', '10000')),
+        ttl=float(os.getenv('USER_CACHE_TTL', '30')),
+        backend=backend,
+        hold=float(os.getenv('USER_CACHE_HOLD', '2')),
+    )
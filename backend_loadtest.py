@@ -0,0 +1,172 @@
+"""Async load generator for the Life RPG API.
+
+Requests carry the payloads in backend_payloads.py, the same ones
+backend_test.py sends. Each virtual user registers, sets an avatar, then
+loops create quest -> complete quest -> leaderboard until the run ends.
+Virtual users start evenly over the ramp-up period. Latency percentiles,
+error counts and throughput are reported per endpoint as JSON, so runs can
+be diffed over time.
+
+    python backend_loadtest.py --users 50 --ramp-up 10 --duration 60 --output run.json
+
+Needs httpx. With --in-memory the app is served in-process against
+mongomock-motor instead of a running server and MongoDB.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from backend_payloads import AVATAR_DATA, QUEST_DATA, registration_data
+from benchmarks.stats import percentile
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, name, method, url, expected=200, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][str(response.status_code)] += 1
+        if response.status_code != expected:
+            self.errors[name] += 1
+            return None
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': self.errors[name],
+                'statuses': dict(self.statuses[name]),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 99) * 1000, 2),
+                'max_ms': round(max(samples) * 1000, 2),
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        return {
+            'requests': total,
+            'errors': sum(e['errors'] for e in endpoints.values()),
+            'throughput_rps': round(total / elapsed, 2),
+            'endpoints': endpoints,
+        }
+
+
+async def virtual_user(client, recorder, index, start_at, deadline, think_time):
+    await asyncio.sleep(max(0.0, start_at - time.perf_counter()))
+
+    response = await recorder.request(
+        client, 'POST /auth/register', 'POST', '/auth/register',
+        json=registration_data(f"load_{index}_{uuid.uuid4().hex[:8]}")
+    )
+    if response is None:
+        return
+    headers = {'Authorization': f"Bearer {response.json()['token']}"}
+    await recorder.request(client, 'PUT /user/avatar', 'PUT', '/user/avatar', json=AVATAR_DATA, headers=headers)
+
+    while time.perf_counter() < deadline:
+        response = await recorder.request(client, 'POST /quests/create', 'POST', '/quests/create', json=QUEST_DATA, headers=headers)
+        if response is not None:
+            quest_id = response.json()['id']
+            await recorder.request(client, 'POST /quests/{id}/complete', 'POST', f'/quests/{quest_id}/complete', headers=headers)
+        await recorder.request(client, 'GET /leaderboard', 'GET', '/leaderboard')
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+def in_memory_transport():
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-memory needs mongomock-motor (pip install mongomock-motor)")
+    # The Motor client server.py creates is never used; it only needs a URL.
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'loadtest')
+    # mongomock has no transactions
+    os.environ.setdefault('QUEST_TRANSACTIONS', 'false')
+    import server
+    server.db = AsyncMongoMockClient()['loadtest']
+    return httpx.ASGITransport(app=server.app)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.in_memory:
+        client = httpx.AsyncClient(transport=in_memory_transport(), base_url='http://loadtest/api', timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout)
+
+    recorder = Recorder()
+    started_at = datetime.now(timezone.utc).isoformat()
+    async with client:
+        start = time.perf_counter()
+        deadline = start + args.ramp_up + args.duration
+        step = args.ramp_up / args.users if args.users else 0
+        await asyncio.gather(*(
+            virtual_user(client, recorder, i, start + i * step, deadline, args.think_time)
+            for i in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+
+    return {
+        'started_at': started_at,
+        'target': 'in-memory' if args.in_memory else args.base_url,
+        'config': {
+            'users': args.users,
+            'ramp_up_s': args.ramp_up,
+            'duration_s': args.duration,
+            'think_time_s': args.think_time,
+        },
+        'python': platform.python_version(),
+        'elapsed_s': round(elapsed, 2),
+        **recorder.report(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000/api')
+    parser.add_argument('--users', type=int, default=20, help='virtual users')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds until all users have started')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run after ramp-up')
+    parser.add_argument('--think-time', type=float, default=0, help='pause between iterations per user')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--in-memory', action='store_true', help='serve the app in-process on mongomock-motor')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 0 if report['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""Request bodies shared by backend_test.py and backend_loadtest.py."""
+
+AVATAR_DATA = {
+    'avatar_class': 'warrior',
+    'avatar_image': 'https://images.unsplash.com/photo-1750092701416-174aaa737e55',
+    'name': 'Test Warrior',
+}
+
+QUEST_DATA = {
+    'title': 'Test Quest',
+    'description': 'A test quest for API testing',
+    'quest_type': 'daily',
+    'difficulty': 'medium',
+    'xp_reward': 100,
+    'gold_reward': 50,
+    'category': 'productivity',
+}
+
+
+def registration_data(suffix):
+    return {
+        'email': f'test_user_{suffix}@example.com',
+        'password': 'TestPass123!',
+        'username': f'test_user_{suffix}',
+    }
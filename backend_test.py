@@ -5,6 +5,8 @@ import base64
 from datetime import datetime
 import time
 
+from backend_payloads import AVATAR_DATA, QUEST_DATA, registration_data
+
 class LifeRPGAPITester:
     def __init__(self, base_url="http://localhost:8000/api"):
         self.base_url = base_url
@@ -79,19 +81,12 @@ class LifeRPGAPITester:
 
     def test_auth_register(self):
         """Test user registration"""
-        timestamp = int(time.time())
-        test_data = {
-            "email": f"test_user_{timestamp}@example.com",
-            "password": "TestPass123!",
-            "username": f"test_user_{timestamp}"
-        }
-        
         success, response = self.run_test(
             "User Registration",
             "POST",
             "auth/register",
             200,
-            data=test_data
+            data=registration_data(int(time.time()))
         )
         
         if success and 'token' in response:
@@ -144,39 +139,23 @@ class LifeRPGAPITester:
 
     def test_avatar_update(self):
         """Test avatar update"""
-        avatar_data = {
-            "avatar_class": "warrior",
-            "avatar_image": "https://images.unsplash.com/photo-1750092701416-174aaa737e55",
-            "name": "Test Warrior"
-        }
-        
         success, response = self.run_test(
             "Update Avatar",
             "PUT",
             "user/avatar",
             200,
-            data=avatar_data
+            data=AVATAR_DATA
         )
         return success
 
     def test_quest_creation(self):
         """Test manual quest creation"""
-        quest_data = {
-            "title": "Test Quest",
-            "description": "A test quest for API testing",
-            "quest_type": "daily",
-            "difficulty": "medium",
-            "xp_reward": 100,
-            "gold_reward": 50,
-            "category": "productivity"
-        }
-        
         success, response = self.run_test(
             "Create Quest",
             "POST",
             "quests/create",
             200,
-            data=quest_data
+            data=QUEST_DATA
         )
         
         if success and 'id' in response:
@@ -253,8 +232,9 @@ class LifeRPGAPITester:
         success, response = self.run_test(
             "Quiz Generation",
             "POST",
-            f"verification/quiz/generate?quest_id={self.quest_id}&notes={test_notes}",
-            200
+            "verification/quiz/generate",
+            200,
+            data={"quest_id": self.quest_id, "notes": test_notes}
         )
         return success
 
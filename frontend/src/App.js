@@ -81,7 +81,7 @@ function App() {
           <Route path="/dashboard" element={user ? <Dashboard user={user} token={token} onUpdate={fetchProfile} /> : <Navigate to="/" />} />
           <Route path="/quests" element={user ? <QuestBoard user={user} token={token} onUpdate={fetchProfile} /> : <Navigate to="/" />} />
           <Route path="/profile" element={user ? <Profile user={user} token={token} /> : <Navigate to="/" />} />
-          <Route path="/leaderboard" element={user ? <Leaderboard /> : <Navigate to="/" />} />
+          <Route path="/leaderboard" element={user ? <Leaderboard token={token} /> : <Navigate to="/" />} />
           <Route path="/shop" element={user ? <Shop user={user} token={token} onUpdate={fetchProfile} /> : <Navigate to="/" />} />
         </Routes>
       </BrowserRouter>
@@ -0,0 +1,49 @@
+import { useEffect, useRef } from 'react';
+
+const WS_URL = `${(process.env.REACT_APP_BACKEND_URL || '').replace(/^http/, 'ws')}/api/ws`;
+const MAX_RETRY_DELAY = 30000;
+
+// Subscribes to the server push channel and calls onMessage for every message.
+// Reconnects with backoff; the server closes slow clients, which then just reconnect.
+export function usePush(token, onMessage) {
+  const handler = useRef(onMessage);
+  handler.current = onMessage;
+
+  useEffect(() => {
+    if (!token) return undefined;
+
+    let socket;
+    let retryTimer;
+    let retryDelay = 1000;
+    let stopped = false;
+
+    const connect = () => {
+      // The token goes in the first message, not the URL, so it stays out of access logs
+      socket = new WebSocket(WS_URL);
+      socket.onopen = () => {
+        retryDelay = 1000;
+        socket.send(JSON.stringify({ type: 'auth', token }));
+      };
+      socket.onmessage = (event) => {
+        try {
+          handler.current(JSON.parse(event.data));
+        } catch (error) {
+          // Ignore malformed messages
+        }
+      };
+      socket.onclose = (event) => {
+        // 1008: the token was rejected, retrying will not help
+        if (stopped || event.code === 1008) return;
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      if (socket) socket.close();
+    };
+  }, [token]);
+}
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Swords, Trophy, Coins, Heart, Flame, Zap } from 'lucide-react';
 import { toast } from 'sonner';
+import { usePush } from '../hooks/use-push';
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -13,22 +14,24 @@ const Dashboard = ({ user, token, onUpdate }) => {
     fetchData();
   }, []);
 
+  usePush(token, (message) => {
+    if (message.type === 'progress') {
+      const { xp, gold, level, streak, xp_to_next_level } = message;
+      setStats((prev) => prev && { ...prev, xp, gold, level, streak, xp_to_next_level });
+    } else if (message.type === 'friend_progress') {
+      toast(`${message.username} completed a quest (level ${message.level})`);
+    }
+  });
+
   const fetchData = async () => {
     try {
-      const [statsRes, questsRes] = await Promise.all([
-        fetch(`${API}/user/stats`, {
-          headers: { 'Authorization': `Bearer ${token}` }
-        }),
-        fetch(`${API}/quests/active`, {
-          headers: { 'Authorization': `Bearer ${token}` }
-        })
-      ]);
-
-      const statsData = await statsRes.json();
-      const questsData = await questsRes.json();
-
-      setStats(statsData);
-      setQuests(questsData.slice(0, 5));
+      const response = await fetch(`${API}/dashboard`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      const data = await response.json();
+
+      setStats(data.stats);
+      setQuests(data.active_quests);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
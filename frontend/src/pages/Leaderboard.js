@@ -1,10 +1,11 @@
 import React, { useState, useEffect } from 'react';
 import { Trophy, Crown, Medal } from 'lucide-react';
 import { toast } from 'sonner';
+import { usePush } from '../hooks/use-push';
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
-const Leaderboard = () => {
+const Leaderboard = ({ token }) => {
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
 
@@ -12,6 +13,15 @@ const Leaderboard = () => {
     fetchLeaderboard();
   }, []);
 
+  usePush(token, (message) => {
+    if (message.type !== 'leaderboard') return;
+    const { type, rank, previous_rank, ...entry } = message;
+    setLeaderboard((prev) => {
+      const others = prev.filter((player) => player.username !== entry.username);
+      return [...others, entry].sort((a, b) => b.xp - a.xp).slice(0, Math.max(prev.length, 1));
+    });
+  });
+
   const fetchLeaderboard = async () => {
     try {
       const response = await fetch(`${API}/leaderboard`);
@@ -29,7 +29,7 @@ const Profile = ({ user, token }) => {
       const questsData = await questsRes.json();
 
       setStats(statsData);
-      setCompletedQuests(questsData);
+      setCompletedQuests(questsData.items);
     } catch (error) {
       toast.error('Failed to load profile data');
     } finally {
@@ -33,7 +33,7 @@ const QuestBoard = ({ user, token, onUpdate }) => {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       const data = await response.json();
-      setQuests(data);
+      setQuests(data.items);
     } catch (error) {
       toast.error('Failed to load quests');
     }
@@ -137,9 +137,16 @@ const QuestBoard = ({ user, token, onUpdate }) => {
 
     setLoading(true);
     try {
-      const response = await fetch(`${API}/verification/quiz/generate?quest_id=${questId}&notes=${encodeURIComponent(notes)}`, {
+      const response = await fetch(`${API}/verification/quiz/generate`, {
         method: 'POST',
-        headers: { 'Authorization': `Bearer ${token}` }
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({
+          quest_id: questId,
+          notes: notes
+        })
       });
 
       if (response.ok) {
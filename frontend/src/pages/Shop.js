@@ -24,12 +24,32 @@ const Shop = ({ user, token, onUpdate }) => {
     }
   };
 
-  const purchaseItem = (item) => {
+  const purchaseItem = async (item) => {
     if (user.gold < item.cost) {
       toast.error('Not enough gold!');
       return;
     }
-    toast.success(`Purchased ${item.name}! (Feature coming soon)`);
+
+    try {
+      const response = await fetch(`${API}/shop/purchase`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({ item_id: item.id })
+      });
+
+      if (response.ok) {
+        toast.success(`Purchased ${item.name}!`);
+        onUpdate();
+      } else {
+        const data = await response.json();
+        toast.error(data.detail || 'Purchase failed');
+      }
+    } catch (error) {
+      toast.error('Connection error');
+    }
   };
 
   if (loading) {
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+# server.py reads these at import; the tests never reach a real MongoDB
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'life_rpg_tests')
+os.environ.setdefault('QUEST_TRANSACTIONS', 'false')
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('PHOTO_STORE', 'local')
+os.environ.setdefault('PHOTO_STORE_DIR', tempfile.mkdtemp(prefix='liferpg-photos-'))
+
+
+@pytest.fixture
+def app_db(monkeypatch):
+    """Point the server module at a fresh in-memory mongomock-motor database."""
+    mongomock_motor = pytest.importorskip('mongomock_motor')
+    import mongomock.collection
+    import server
+
+    # mongomock re-runs the filter to apply a projection to the updated document,
+    # so a write that makes its own guard false comes back as None; re-read by _id instead.
+    original = mongomock.collection.Collection.find_one_and_update
+
+    def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        doc = original(self, filter, update, **kwargs)
+        if doc is None or projection is None:
+            return doc
+        return self.find_one({'_id': doc['_id']}, projection)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one_and_update', find_one_and_update)
+    db = mongomock_motor.AsyncMongoMockClient()['life_rpg_tests']
+    monkeypatch.setattr(server, 'db', db)
+    return db
@@ -0,0 +1,189 @@
+import asyncio
+
+import orjson
+import pytest
+
+from benchmarks.fake_redis import FakeRedis
+from cache_backend import MmapBackend, RespBackend
+from user_cache import TOMBSTONE, UserCache
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def _resp_pair(port):
+    make = lambda: RespBackend(f'redis://127.0.0.1:{port}/0', pool_size=2, timeout=1.0, channel='test:invalidate')
+    return make(), make()
+
+
+def test_resp_get_set_delete_and_nx():
+    async def run():
+        fake = FakeRedis()
+        backend, _ = _resp_pair(await fake.start())
+        try:
+            assert await backend.get('missing') is None
+            assert await backend.set('k', b'v1', ttl=60)
+            assert await backend.get('k') == b'v1'
+            assert not await backend.set('k', b'v2', ttl=60, nx=True)
+            assert await backend.get('k') == b'v1'
+            await backend.delete('k')
+            assert await backend.get('k') is None
+            assert await backend.set('k', b'v3', ttl=60, nx=True)
+            assert await backend.get('k') == b'v3'
+        finally:
+            await backend.stop()
+            await fake.stop()
+
+    asyncio.run(run())
+
+
+def test_resp_ttl_expires():
+    async def run():
+        fake = FakeRedis()
+        backend, _ = _resp_pair(await fake.start())
+        try:
+            await backend.set('k', b'v', ttl=0.05)
+            await asyncio.sleep(0.1)
+            assert await backend.get('k') is None
+        finally:
+            await backend.stop()
+            await fake.stop()
+
+    asyncio.run(run())
+
+
+def test_resp_tombstone_blocks_stale_fill_from_another_worker():
+    async def run():
+        fake = FakeRedis()
+        first, second = _resp_pair(await fake.start())
+        writer = UserCache(max_users=10, ttl=30, backend=first, hold=0.2)
+        reader = UserCache(max_users=10, ttl=30, backend=second, hold=0.2)
+        try:
+            await writer.store_user({'id': 'u1', 'gold': 1})
+            assert await reader.load_user('u1') == {'id': 'u1', 'gold': 1}
+
+            # A write in the first worker; the second then fills with what it read before the write
+            await writer.share_change('u1')
+            assert await second.get('user:u1') == TOMBSTONE
+            reader.invalidate('u1')
+            await reader.store_user({'id': 'u1', 'gold': 1})
+            assert await second.get('user:u1') == TOMBSTONE
+
+            await asyncio.sleep(0.3)
+            await reader.store_user({'id': 'u1', 'gold': 2})
+            assert orjson.loads(await first.get('user:u1')) == {'id': 'u1', 'gold': 2}
+        finally:
+            await first.stop()
+            await second.stop()
+            await fake.stop()
+
+    asyncio.run(run())
+
+
+def test_resp_publish_reaches_other_instances_only():
+    async def run():
+        fake = FakeRedis()
+        first, second = _resp_pair(await fake.start())
+        received_first, received_second = [], []
+        first.start(received_first.append)
+        second.start(received_second.append)
+        try:
+            await _wait_for(lambda: sum(len(s) for s in fake.channels.values()) == 2)
+            await first.publish(b'u user-1 user-2')
+            await _wait_for(lambda: received_second)
+            assert received_second == [b'u user-1 user-2']
+            await asyncio.sleep(0.05)
+            assert received_first == []
+        finally:
+            await first.stop()
+            await second.stop()
+            await fake.stop()
+
+    asyncio.run(run())
+
+
+def test_resp_failures_are_misses_not_errors():
+    async def run():
+        fake = FakeRedis()
+        port = await fake.start()
+        await fake.stop()
+        backend, _ = _resp_pair(port)
+        assert await backend.get('k') is None
+        assert not await backend.set('k', b'v', ttl=60)
+        assert backend.errors == 2
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def mmap_path(tmp_path):
+    pytest.importorskip('fcntl')
+    return str(tmp_path / 'cache')
+
+
+def _mmap(path, ring_size=8):
+    return MmapBackend(path, slots=64, slot_size=256, ring_size=ring_size, poll_interval=0.01)
+
+
+def test_mmap_writes_are_visible_to_a_second_instance(mmap_path):
+    async def run():
+        first, second = _mmap(mmap_path), _mmap(mmap_path)
+        assert await first.set('user:1', b'payload', ttl=60)
+        assert await second.get('user:1') == b'payload'
+        assert not await second.set('user:1', b'other', ttl=60, nx=True)
+        await second.delete('user:1')
+        assert await first.get('user:1') is None
+        # Larger than a slot: not cached rather than truncated
+        assert not await first.set('user:2', b'x' * 300, ttl=60)
+        assert await second.get('user:2') is None
+
+    asyncio.run(run())
+
+
+def test_mmap_second_instance_keeps_the_existing_file(mmap_path):
+    async def run():
+        first = _mmap(mmap_path)
+        await first.set('k', b'v', ttl=60)
+        second = MmapBackend(mmap_path, slots=8, slot_size=128, ring_size=4, poll_interval=0.01)
+        assert (second.slots, second.slot_size, second.ring_size) == (64, 256, 8)
+        assert await second.get('k') == b'v'
+
+    asyncio.run(run())
+
+
+def test_mmap_ring_messages_reach_the_other_instance(mmap_path):
+    async def run():
+        first, second = _mmap(mmap_path), _mmap(mmap_path)
+        received_first, received_second = [], []
+        first.start(received_first.append)
+        second.start(received_second.append)
+        try:
+            await first.publish(b'u a')
+            await first.publish(b'l b')
+            await _wait_for(lambda: len(received_second) == 2)
+            assert received_second == [b'u a', b'l b']
+            assert received_first == []
+        finally:
+            await first.stop()
+            await second.stop()
+
+    asyncio.run(run())
+
+
+def test_mmap_reader_that_falls_a_ring_behind_gets_a_reset(mmap_path):
+    async def run():
+        first, second = _mmap(mmap_path, ring_size=4), _mmap(mmap_path, ring_size=4)
+        received = []
+        second._on_message = received.append
+        for i in range(6):
+            await first.publish(b'u %d' % i)
+        second.poll()
+        assert received == [None]
+        assert second.resets == 1
+
+    asyncio.run(run())
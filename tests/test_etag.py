@@ -0,0 +1,46 @@
+from etag import Versions, etag_matches, static_etag
+
+
+def test_no_header_never_matches():
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches('', '"abc"')
+
+
+def test_wildcard_matches_anything():
+    assert etag_matches('*', '"abc"')
+    assert etag_matches(' * ', 'W/"abc"')
+
+
+def test_comparison_is_weak():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    # the quotes are part of the tag
+    assert not etag_matches('abc', '"abc"')
+
+
+def test_list_of_candidates():
+    assert etag_matches('"one", W/"abc" ,"two"', '"abc"')
+    assert not etag_matches('"one","two"', '"abc"')
+
+
+def test_versions_change_on_bump_and_rotate():
+    versions = Versions()
+    first = versions.etag('leaderboard')
+    assert etag_matches(first, versions.etag('leaderboard'))
+    versions.bump('leaderboard')
+    bumped = versions.etag('leaderboard')
+    assert not etag_matches(first, bumped)
+    versions.rotate()
+    assert not etag_matches(bumped, versions.etag('leaderboard'))
+    # asking about a key does not start tracking it
+    versions.etag('user:unknown')
+    assert 'user:unknown' not in versions._versions
+
+
+def test_static_etag_is_strong_and_content_based():
+    assert static_etag(b'body') == static_etag(b'body')
+    assert static_etag(b'body') != static_etag(b'other')
+    assert not static_etag(b'body').startswith('W/')
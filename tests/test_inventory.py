@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('mongomock_motor')
+httpx = pytest.importorskip('httpx')
+
+import server
+
+
+async def _register(c, name='alice'):
+    r = await c.post('/api/auth/register', json={'email': f'{name}@example.com', 'password': 'pw', 'username': name})
+    assert r.status_code == 200, r.text
+    return {'Authorization': 'Bearer ' + r.json()['token']}
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test')
+
+
+def test_use_item_requires_one_in_inventory(app_db):
+    async def run():
+        async with _client() as c:
+            headers = await _register(c)
+            r = await c.post('/api/inventory/use', json={'item_id': 'xp_boost'}, headers=headers)
+            assert r.status_code == 400
+            assert r.json()['detail'] == "Item not in inventory"
+
+            await app_db.users.update_one({'username': 'alice'}, {'$set': {'gold': 100}})
+            r = await c.post('/api/shop/purchase', json={'item_id': 'xp_boost'}, headers=headers)
+            assert r.status_code == 200, r.text
+
+            r = await c.post('/api/inventory/use', json={'item_id': 'xp_boost'}, headers=headers)
+            assert r.status_code == 200, r.text
+            r = await c.post('/api/inventory/use', json={'item_id': 'xp_boost'}, headers=headers)
+            assert r.status_code == 400
+
+        user = await app_db.users.find_one({'username': 'alice'})
+        assert user['inventory']['xp_boost'] == 0
+        assert user['active_boosts']['xp_x2'] == 1
+
+    asyncio.run(run())
+
+
+def test_parallel_uses_never_go_negative(app_db):
+    async def run():
+        async with _client() as c:
+            headers = await _register(c)
+            await app_db.users.update_one({'username': 'alice'}, {'$set': {'inventory.health_potion': 2, 'hp': 10}})
+            responses = await asyncio.gather(*[
+                c.post('/api/inventory/use', json={'item_id': 'health_potion'}, headers=headers)
+                for _ in range(5)
+            ])
+            assert sorted(r.status_code for r in responses) == [200, 200, 400, 400, 400]
+
+        user = await app_db.users.find_one({'username': 'alice'})
+        assert user['inventory']['health_potion'] == 0
+        assert user['hp'] == 100
+
+    asyncio.run(run())
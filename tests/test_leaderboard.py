@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from leaderboard import Leaderboard
+
+
+def _board(*users):
+    board = Leaderboard()
+    for user_id, xp in users:
+        board.upsert(user_id, username=user_id, xp=xp)
+    return board
+
+
+def test_rank_and_page_follow_xp():
+    board = _board(('a', 100), ('b', 300), ('c', 200))
+    assert [board.rank(u) for u in 'bca'] == [1, 2, 3]
+    assert [e['username'] for e in board.page(0, 10)] == ['b', 'c', 'a']
+    assert [e['username'] for e in board.page(1, 1)] == ['c']
+    assert board.page(5, 10) == []
+    assert board.rank('missing') is None
+
+
+def test_ties_break_on_user_id():
+    board = _board(('b', 100), ('a', 100), ('c', 100))
+    assert [board.rank(u) for u in 'abc'] == [1, 2, 3]
+
+
+def test_upsert_moves_a_user_and_keeps_other_fields():
+    board = _board(('a', 100), ('b', 300))
+    board.upsert('a', xp=400, level=4)
+    assert board.rank('a') == 1
+    assert board.entry('a') == {'username': 'a', 'level': 4, 'xp': 400}
+    board.upsert('a', avatar_image='img-ref')
+    assert board.entry('a')['avatar'] == {'avatar_image': 'img-ref'}
+    assert board.rank('a') == 1
+    assert len(board) == 2
+
+
+def test_new_user_starts_at_zero():
+    board = _board(('a', 100))
+    board.upsert('new', username='new')
+    assert board.entry('new') == {'username': 'new', 'level': 1, 'xp': 0}
+    assert board.rank('new') == 2
+
+
+def test_remove():
+    board = _board(('a', 100), ('b', 300), ('c', 200))
+    board.remove('c')
+    board.remove('missing')
+    assert len(board) == 2
+    assert board.rank('a') == 2
+    assert board.entry('c') is None
+
+
+class _Cursor:
+    """Yields documents as read at scan time and runs ``during`` halfway through."""
+
+    def __init__(self, docs, during):
+        self.docs = docs
+        self.during = during
+
+    def __aiter__(self):
+        return self._scan()
+
+    async def _scan(self):
+        for i, doc in enumerate(self.docs):
+            if i == len(self.docs) // 2:
+                self.during()
+            await asyncio.sleep(0)
+            yield dict(doc)
+
+
+class _Users:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def find(self, *args, **kwargs):
+        return self.cursor
+
+
+class _Db:
+    def __init__(self, cursor):
+        self.users = _Users(cursor)
+
+
+def test_rebuild_replays_changes_made_during_the_scan():
+    board = Leaderboard()
+    stale = [
+        {'id': 'a', 'username': 'a', 'level': 1, 'xp': 100},
+        {'id': 'b', 'username': 'b', 'level': 1, 'xp': 200},
+        {'id': 'c', 'username': 'c', 'level': 1, 'xp': 300},
+        {'id': 'd', 'username': 'd', 'level': 1, 'xp': 400},
+    ]
+
+    def during():
+        # Writes racing the scan: 'd' is read after it was removed and 'a' before it gained xp.
+        board.upsert('a', xp=1000, level=5)
+        board.upsert('e', username='e')
+        board.upsert('e', xp=250)
+        board.remove('d')
+
+    asyncio.run(board.rebuild(_Db(_Cursor(stale, during))))
+
+    assert len(board) == 4
+    assert board.entry('d') is None
+    assert board.entry('a') == {'username': 'a', 'level': 5, 'xp': 1000}
+    assert [board.rank(u) for u in 'aceb'] == [1, 2, 3, 4]
+    assert board._changes is None
+
+
+def test_rebuild_stops_recording_when_the_scan_fails():
+    class _Failing:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise RuntimeError("connection lost")
+
+    board = _board(('a', 100))
+    with pytest.raises(RuntimeError):
+        asyncio.run(board.rebuild(_Db(_Failing())))
+    assert board._changes is None
+    assert board.rank('a') == 1
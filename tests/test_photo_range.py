@@ -0,0 +1,38 @@
+import pytest
+from fastapi import HTTPException
+from server import _parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=500-', (500, 999)),
+    ('bytes=-100', (900, 999)),
+    # an end past the body or a suffix longer than it is clamped
+    ('bytes=900-5000', (900, 999)),
+    ('bytes=-5000', (0, 999)),
+    ('bytes=999-999', (999, 999)),
+])
+def test_single_ranges(header, expected):
+    assert _parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', [
+    None,
+    '',
+    'items=0-10',
+    'bytes=0-10,20-30',
+    'bytes=abc-def',
+    'bytes=10-x',
+])
+def test_unsupported_ranges_get_the_full_body(header):
+    assert _parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=1200-1300', 'bytes=50-10', 'bytes=-0'])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, SIZE)
+    assert exc.value.status_code == 416
+    assert exc.value.headers['Content-Range'] == f'bytes */{SIZE}'
@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+
+from progression import LEVEL_THRESHOLDS, apply_reward, level_for_xp, next_streak, reward_pipeline
+
+mongomock = pytest.importorskip('mongomock')
+from pymongo import ReturnDocument
+
+TODAY = date(2024, 3, 10)
+YESTERDAY = '2024-03-09'
+
+
+@pytest.fixture
+def users():
+    return mongomock.MongoClient()['life_rpg_tests']['users']
+
+
+def _run_pipeline(users, before, xp, gold, boosts):
+    users.insert_one({'id': 'u1', **before})
+    pre = users.find_one_and_update(
+        {'id': 'u1'}, reward_pipeline(xp, gold, TODAY, boosts),
+        projection={'_id': 0}, return_document=ReturnDocument.BEFORE)
+    stored = users.find_one({'id': 'u1'}, {'_id': 0})
+    return pre, stored
+
+
+def test_level_for_xp_thresholds():
+    assert level_for_xp(0) == 1
+    assert level_for_xp(LEVEL_THRESHOLDS[0] - 1) == 1
+    assert level_for_xp(LEVEL_THRESHOLDS[0]) == 2
+    assert level_for_xp(LEVEL_THRESHOLDS[1]) == 3
+    # levels never go down, even if xp was reset below the threshold
+    assert level_for_xp(0, current_level=5) == 5
+
+
+def test_next_streak():
+    assert next_streak(YESTERDAY, 3, TODAY) == 4
+    assert next_streak(TODAY.isoformat(), 3, TODAY) == 3
+    assert next_streak('2024-03-01', 3, TODAY) == 1
+    assert next_streak(None, 0, TODAY) == 1
+
+
+@pytest.mark.parametrize('before, xp, gold', [
+    # new user, no progression fields yet
+    ({}, 50, 10),
+    # one xp short of level 2, then exactly on it
+    ({'xp': LEVEL_THRESHOLDS[0] - 51, 'level': 1, 'gold': 0, 'streak': 0}, 50, 5),
+    ({'xp': LEVEL_THRESHOLDS[0] - 50, 'level': 1, 'gold': 0, 'streak': 0}, 50, 5),
+    # one reward jumping several levels at once
+    ({'xp': 90, 'level': 1, 'gold': 20, 'streak': 2, 'last_quest_date': YESTERDAY}, 1000, 50),
+    # stored level ahead of xp stays put
+    ({'xp': 10, 'level': 7, 'gold': 0, 'streak': 1, 'last_quest_date': TODAY.isoformat()}, 10, 1),
+    # streak broken by a gap
+    ({'xp': LEVEL_THRESHOLDS[5], 'level': 7, 'gold': 3, 'streak': 9, 'last_quest_date': '2024-03-01'}, 200, 40),
+    # near the top of the table
+    ({'xp': LEVEL_THRESHOLDS[-2] - 1, 'level': len(LEVEL_THRESHOLDS), 'gold': 0, 'streak': 0}, 1, 0),
+])
+@pytest.mark.parametrize('boosts', [False, True])
+def test_reward_pipeline_matches_apply_reward(users, before, xp, gold, boosts):
+    pre, stored = _run_pipeline(users, before, xp, gold, boosts)
+    expected = apply_reward(pre, xp, gold, TODAY, boosts)
+    for field in ('xp', 'gold', 'level', 'streak', 'last_quest_date'):
+        assert stored[field] == expected[field], field
+
+
+@pytest.mark.parametrize('charges', [
+    {'xp_x2': 1, 'gold_x2': 0},
+    {'xp_x2': 0, 'gold_x2': 2},
+    {'xp_x2': 3, 'gold_x2': 1},
+])
+def test_reward_pipeline_consumes_boosts_like_apply_reward(users, charges):
+    before = {'xp': 90, 'level': 1, 'gold': 0, 'streak': 3, 'last_quest_date': YESTERDAY, 'active_boosts': charges}
+    pre, stored = _run_pipeline(users, before, 100, 25, True)
+    expected = apply_reward(pre, 100, 25, TODAY, True)
+    assert stored['xp'] == expected['xp']
+    assert stored['gold'] == expected['gold']
+    assert stored['level'] == expected['level']
+    assert stored['active_boosts'] == expected['active_boosts']
+    assert all(count >= 0 for count in stored['active_boosts'].values())
+
+
+def test_reward_pipeline_ignores_boosts_when_disabled(users):
+    before = {'xp': 0, 'level': 1, 'gold': 0, 'streak': 0, 'active_boosts': {'xp_x2': 1, 'gold_x2': 1}}
+    _, stored = _run_pipeline(users, before, 100, 50, False)
+    assert (stored['xp'], stored['gold']) == (100, 50)
+    assert stored['active_boosts'] == {'xp_x2': 1, 'gold_x2': 1}
@@ -0,0 +1,35 @@
+import orjson
+from starlette.testclient import TestClient
+
+import server
+
+
+def _receive_close(ws):
+    message = ws.receive()
+    assert message['type'] == 'websocket.close'
+    return message['code']
+
+
+def test_binary_first_frame_is_rejected():
+    with TestClient(server.app).websocket_connect('/api/ws') as ws:
+        ws.send_bytes(b'\x00\x01')
+        assert _receive_close(ws) == 1008
+
+
+def test_bad_token_is_rejected():
+    with TestClient(server.app).websocket_connect('/api/ws') as ws:
+        ws.send_text(orjson.dumps({'type': 'auth', 'token': 'not-a-jwt'}).decode())
+        assert _receive_close(ws) == 1008
+
+
+def test_disconnect_before_auth_is_quiet():
+    with TestClient(server.app).websocket_connect('/api/ws') as ws:
+        ws.close()
+
+
+def test_auth_message_opens_the_feed():
+    with TestClient(server.app).websocket_connect('/api/ws') as ws:
+        ws.send_text(orjson.dumps({'type': 'auth', 'token': server.create_token('user-1')}).decode())
+        assert orjson.loads(ws.receive_text()) == {'type': 'ready', 'rank': None}
+        # the feed runs until the client leaves
+        ws.close()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from quiz import DEFAULT_TEMPLATE_ID, QuizError, grade, notes_id, quiz_reference, store_notes
+
+
+@pytest.fixture
+def reference():
+    return quiz_reference(DEFAULT_TEMPLATE_ID, notes_id('notes'))
+
+
+def test_reference_copies_the_answer_key(reference):
+    assert reference['answer_key'] == [0, 0, 0]
+    assert reference['pass_score'] == 2
+    assert reference['passed'] is False
+
+
+@pytest.mark.parametrize('answers, score, passed', [
+    (['0', '0', '0'], 3, True),
+    (['0', '1', '0'], 2, True),
+    (['0', '1', '2'], 1, False),
+    (['3', '3', '3'], 0, False),
+])
+def test_grade_scores_against_the_key(reference, answers, score, passed):
+    assert grade(reference, answers) == {'passed': passed, 'score': score, 'total': 3}
+
+
+def test_grade_rejects_wrong_answer_count(reference):
+    with pytest.raises(QuizError):
+        grade(reference, ['0', '0'])
+
+
+def test_grade_rejects_non_index_answers(reference):
+    with pytest.raises(QuizError):
+        grade(reference, ['Yes', '0', '0'])
+
+
+def test_grade_legacy_inline_questions():
+    legacy = {'questions': [
+        {'question': 'a', 'options': ['x', 'y'], 'correct_answer': 1},
+        {'question': 'b', 'options': ['x', 'y'], 'correct_answer': 0},
+        {'question': 'c', 'options': ['x', 'y'], 'correct_answer': 1},
+    ]}
+    assert grade(legacy, ['1', '0', '0']) == {'passed': True, 'score': 2, 'total': 3}
+    assert grade(legacy, ['0', '1', '0'])['passed'] is False
+
+
+def test_notes_id_is_content_addressed():
+    assert notes_id('same') == notes_id('same')
+    assert notes_id('same') != notes_id('other')
+
+
+def test_store_notes_keeps_one_copy():
+    mongomock_motor = pytest.importorskip('mongomock_motor')
+
+    async def run():
+        db = mongomock_motor.AsyncMongoMockClient()['life_rpg_tests']
+        note_id = notes_id('did the thing')
+        await asyncio.gather(*(store_notes(db, note_id, 'did the thing') for _ in range(3)))
+        assert await db.quiz_notes.count_documents({}) == 1
+        stored = await db.quiz_notes.find_one({'_id': note_id})
+        assert stored['notes'] == 'did the thing'
+        assert stored['size'] == len('did the thing')
+
+    asyncio.run(run())
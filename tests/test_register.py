@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+httpx = pytest.importorskip('httpx')
+
+import server
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test')
+
+
+def _payload(email, username):
+    return {'email': email, 'password': 'pw', 'username': username}
+
+
+@pytest.fixture
+def users_cls(app_db):
+    # mongomock-motor builds a new collection object per attribute access, so patch the class
+    return type(app_db.users)
+
+
+def test_duplicates_found_by_the_checks(app_db):
+    async def run():
+        async with _client() as c:
+            assert (await c.post('/api/auth/register', json=_payload('a@example.com', 'alice'))).status_code == 200
+            r = await c.post('/api/auth/register', json=_payload('a@example.com', 'other'))
+            assert (r.status_code, r.json()['detail']) == (400, "Email already registered")
+            r = await c.post('/api/auth/register', json=_payload('b@example.com', 'alice'))
+            assert (r.status_code, r.json()['detail']) == (400, "Username already taken")
+
+    asyncio.run(run())
+
+
+def test_username_taken_between_check_and_insert(app_db, users_cls, monkeypatch):
+    async def run():
+        await app_db.users.create_index('username', unique=True, name='username_unique')
+        async with _client() as c:
+            assert (await c.post('/api/auth/register', json=_payload('a@example.com', 'alice'))).status_code == 200
+
+            async def find_one(self, *args, **kwargs):
+                return None
+            # the other registration lands after this one's checks
+            monkeypatch.setattr(users_cls, 'find_one', find_one)
+            r = await c.post('/api/auth/register', json=_payload('b@example.com', 'alice'))
+            assert (r.status_code, r.json()['detail']) == (400, "Username already taken")
+        assert await app_db.users.count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_email_taken_between_check_and_insert(app_db, users_cls, monkeypatch):
+    async def insert_one(self, *args, **kwargs):
+        raise DuplicateKeyError("E11000 duplicate key error", 11000, {'keyPattern': {'email': 1}})
+    monkeypatch.setattr(users_cls, 'insert_one', insert_one)
+
+    async def run():
+        async with _client() as c:
+            r = await c.post('/api/auth/register', json=_payload('a@example.com', 'alice'))
+            assert (r.status_code, r.json()['detail']) == (400, "Email already registered")
+
+    asyncio.run(run())
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from starlette.responses import JSONResponse, StreamingResponse
+
+from singleflight import SingleFlight
+
+
+class Counter:
+    def __init__(self, delay=0.02):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self, value):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {'value': value, 'call': self.calls}
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight, fn = SingleFlight(max_entries=8), Counter()
+        results = await asyncio.gather(*(flight.do(('f', 1), fn, 1) for _ in range(5)))
+        assert fn.calls == 1
+        assert all(r is results[0] for r in results)
+        # different keys run separately
+        await asyncio.gather(flight.do(('f', 1), fn, 1), flight.do(('f', 2), fn, 2))
+        assert fn.calls == 3
+        stats = flight.stats()
+        assert (stats['calls'], stats['executed'], stats['coalesced']) == (7, 3, 4)
+        assert stats['in_flight'] == 0
+
+    asyncio.run(run())
+
+
+def test_ttl_serves_results_after_completion():
+    async def run():
+        flight, fn = SingleFlight(max_entries=8), Counter(delay=0)
+        await flight.do(('f', 1), fn, 1, ttl=0.05)
+        await flight.do(('f', 1), fn, 1, ttl=0.05)
+        assert fn.calls == 1
+        assert flight.stats()['cache_hits'] == 1
+        await asyncio.sleep(0.06)
+        await flight.do(('f', 1), fn, 1, ttl=0.05)
+        assert fn.calls == 2
+        # without a ttl nothing outlives the call
+        await flight.do(('g', 1), fn, 1)
+        await flight.do(('g', 1), fn, 1)
+        assert fn.calls == 4
+
+    asyncio.run(run())
+
+
+def test_exceptions_reach_every_waiter_and_are_not_cached():
+    async def run():
+        flight = SingleFlight(max_entries=8)
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flight.do(('f',), failing, ttl=60) for _ in range(3)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flight.do(('f',), failing, ttl=60)
+        assert calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def run():
+        flight, fn = SingleFlight(max_entries=8), Counter(delay=0.05)
+        leader = asyncio.create_task(flight.do(('f', 1), fn, 1))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(('f', 1), fn, 1))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert (await follower)['value'] == 1
+        assert leader.cancelled()
+        assert fn.calls == 1
+
+    asyncio.run(run())
+
+
+def test_cache_is_bounded():
+    async def run():
+        flight, fn = SingleFlight(max_entries=2), Counter(delay=0)
+        for value in range(4):
+            await flight.do(('f', value), fn, value, ttl=60)
+        assert flight.stats()['cached'] == 2
+        # the oldest entries were evicted
+        await flight.do(('f', 0), fn, 0, ttl=60)
+        assert fn.calls == 5
+
+    asyncio.run(run())
+
+
+def test_coalesce_keys_on_vary_and_copies_responses():
+    async def run():
+        flight = SingleFlight(max_entries=8)
+        calls = 0
+
+        @flight.coalesce(vary=('page',))
+        async def route(page: int, request_id: str):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return JSONResponse({'page': page})
+
+        first, second = await asyncio.gather(route(1, 'a'), route(1, 'b'))
+        assert calls == 1
+        assert first is not second
+        first.headers['X-Extra'] = '1'
+        assert 'x-extra' not in second.headers
+
+    asyncio.run(run())
+
+
+def test_coalesce_refuses_streaming_responses():
+    async def run():
+        flight = SingleFlight(max_entries=8)
+
+        @flight.coalesce()
+        async def route():
+            return StreamingResponse(iter([b'x']))
+
+        with pytest.raises(TypeError):
+            await route()
+
+    asyncio.run(run())
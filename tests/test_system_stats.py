@@ -0,0 +1,11 @@
+from starlette.testclient import TestClient
+
+import server
+
+
+def test_stats_are_not_served_under_the_public_prefix():
+    client = TestClient(server.app)
+    assert client.get('/api/system/stats').status_code == 404
+    response = client.get('/system/stats')
+    assert response.status_code == 200
+    assert 'user_cache' in response.json()